@@ -18,6 +18,7 @@ function die_usage() {
   echo "  $0 run-all                     Run all the required end-to-end (For deployment)"
   echo "  $0 favicons_covers             Run favicons and cover_images"
   echo "  $0 healthcheck                 Run healthcheck for status.brave.com"
+  echo "  $0 cache-hit-report [args]     Report the cache hit rates (see --help)"
   echo "  $0 shell                       Start a bpython shell"
   exit 1
 }
@@ -68,6 +69,9 @@ elif [[ "$task" = "healthcheck" ]]; then
   echo "Starting health check job..."
   python -u src/healthcheck.py
 
+elif [[ "$task" = "cache-hit-report" ]]; then
+  python -u src/cache_hit_report.py "${@:2}"
+
 elif [[ "$task" = "shell" ]]; then
   set -x
   bpython
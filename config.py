@@ -14,8 +14,6 @@ import structlog
 from google.cloud import language_v1
 from pydantic import BaseSettings, Field, validator
 from pytz import timezone
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
 
 logger = structlog.getLogger(__name__)
 
@@ -41,6 +39,39 @@ class Configuration(BaseSettings):
     # Set the number of processes to spawn for all multiprocessing tasks.
     concurrency: int = cpu_count() - 1
     thread_pool_size: int = cpu_count() * 5
+    # Caps on the feed downloads in flight on the event loop, overall and per host.
+    feed_fetch_concurrency: int = 300
+    feed_fetch_per_host_limit: int = 4
+    # Number of hosts the shared HTTP client keeps a connection pool for.
+    http_pool_connections: int = 1000
+
+    # Feeds idle for longer than this (in seconds) are not polled every run anymore, but
+    # at most once every feed_max_poll_interval seconds.
+    feed_poll_idle_threshold: int = 24 * 60 * 60
+    feed_max_poll_interval: int = 12 * 60 * 60
+
+    # Feeds failing to download this many runs in a row are skipped for a growing number
+    # of runs, up to feed_max_skip_runs.
+    feed_failure_threshold: int = 2
+    feed_max_skip_runs: int = 32
+    # Max number of feeds being downloaded or waiting to be parsed at any time. Downloads
+    # only start once there is room, so they wait whenever the parsing stage falls behind.
+    feed_pipeline_size: int = 100
+    # Number of entries sent at once to the article processing pool, across feeds.
+    process_batch_size: int = 200
+    # Time (in seconds) the final URL of a resolved article link is reused for.
+    unshorten_cache_ttl: int = 7 * 24 * 60 * 60
+    # Stored articles published within this many days are loaded at once, to find the
+    # entries that were already processed without a query per entry.
+    article_index_days: int = 60
+    # Rules applied to the article URLs before hashing them, unless the publisher sets its own
+    # in the URL Rules column of the sources. See aggregator.url_canonicalizer for the rules.
+    url_canonicalization_rules = [
+        "normalize_host",
+        "drop_fragment",
+        "drop_tracking_params",
+        "strip_trailing_slash",
+    ]
 
     # Disable uploads and downloads to S3. Useful when running locally or in CI.
     no_upload: Optional[str] = None
@@ -65,6 +96,8 @@ class Configuration(BaseSettings):
     favicon_lookup_file: Path = Field(default="favicon_lookup.json")
     cover_info_lookup_file: Path = Field(default="cover_info_lookup.json")
     cover_info_cache_dir: Path = Field(default="cover_info_cache")
+    # Per-locale state kept across runs, e.g. the HTTP validators of each feed.
+    state_dir: Path = Field(default="state")
     tests_dir: Path = Field(default=Path(__file__).parent / "tests")
     tests_data_dir: Path = Field(default=Path(__file__).parent / "tests/tests_data")
     taxonomy_v1_file: Path = Field(
@@ -133,19 +166,22 @@ class Configuration(BaseSettings):
 
     database_url: Optional[str] = None
     schema_name: Optional[str] = "news"
+    # Connections kept open by the database engine of each process, and extra connections
+    # opened when they are all in use. Both default to the size of the thread pools, so that
+    # every thread can hold a connection, and a second one for a nested session.
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    # Rows written by each statement of a bulk upsert
+    db_batch_size: int = 500
+    # Records waiting to be written by the background database writer, before the stages
+    # queueing them wait for it
+    db_write_queue_size: int = 10000
 
     def gcp_client(self):
         return language_v1.LanguageServiceClient(
             client_options={"api_key": self.google_api_key}
         )
 
-    def get_db_session(self) -> Session:
-        """
-        Get a database session
-        """
-        engine = create_engine(self.database_url)
-        return sessionmaker(bind=engine)()
-
     @validator("img_cache_path")
     def create_img_cache_path(cls, v: Path) -> Path:
         v.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,62 @@
+"""feed_update_record timedelta in seconds
+
+Revision ID: 3f1d2c9a7b41
+Revises: 6c046672a695
+Create Date: 2026-10-17 09:00:12.402117+00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3f1d2c9a7b41"
+down_revision = "6c046672a695"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The column holds the seconds between the last two builds of a feed, which a
+    # DateTime cannot store. Nothing wrote to it so far, so the values are reset.
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.DateTime,
+        server_default=None,
+    )
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.DateTime,
+        type_=sa.Float,
+        postgresql_using="0",
+    )
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.Float,
+        server_default=sa.text("0"),
+    )
+
+
+def downgrade() -> None:
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.Float,
+        server_default=None,
+    )
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.Float,
+        type_=sa.DateTime,
+        postgresql_using="now()",
+    )
+    op.alter_column(
+        "feed_update_record",
+        "last_build_timedelta",
+        existing_type=sa.DateTime,
+        server_default=sa.func.now(),
+    )
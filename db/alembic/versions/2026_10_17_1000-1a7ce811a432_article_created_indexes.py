@@ -0,0 +1,35 @@
+"""article created indexes
+
+Revision ID: 1a7ce811a432
+Revises: 3f1d2c9a7b41
+Create Date: 2026-10-17 10:00:41.215830+00:00
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "1a7ce811a432"
+down_revision = "3f1d2c9a7b41"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The cache hit stats select the articles created within a window, overall or per
+    # feed, and join their cache records through uq_arc_locale.
+    op.create_index(
+        "idx_article_created", "article", ["created"], unique=False, if_not_exists=True
+    )
+    op.create_index(
+        "idx_article_feed_id_created",
+        "article",
+        ["feed_id", "created"],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_article_feed_id_created", table_name="article", if_exists=True)
+    op.drop_index("idx_article_created", table_name="article", if_exists=True)
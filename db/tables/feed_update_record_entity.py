@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, func
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from db.tables.base import Base
@@ -13,7 +13,8 @@ class FeedUpdateRecordEntity(Base):
         BigInteger, ForeignKey("feed.id"), nullable=False, unique=True, index=True
     )
     last_build_time = Column(DateTime, nullable=False)
-    last_build_timedelta = Column(DateTime, server_default=func.now(), nullable=False)
+    # seconds between the last two builds of the feed
+    last_build_timedelta = Column(Float, default=0.0, nullable=False)
     created = Column(DateTime, server_default=func.now(), nullable=False)
 
     modified = Column(
@@ -29,7 +30,7 @@ class FeedUpdateRecordEntity(Base):
         return {
             "id": self.id,
             "feed_id": self.feed_id,
-            "last_build_timedate": self.last_build_timedate,
+            "last_build_time": self.last_build_time,
             "last_build_timedelta": self.last_build_timedelta,
             "created": self.created,
             "modified": self.modified,
@@ -38,13 +39,13 @@ class FeedUpdateRecordEntity(Base):
     def to_insert(self) -> dict:
         return {
             "feed_id": self.feed_id,
-            "last_build_timedate": self.last_build_timedate,
+            "last_build_time": self.last_build_time,
             "last_build_timedelta": self.last_build_timedelta,
         }
 
     def __str__(self) -> str:
         return (
             f"FeedLastBuild id={self.id} feed_id={self.feed_id} "
-            f"last_build_timedate={self.last_build_timedate} "
+            f"last_build_time={self.last_build_time} "
             f"last_build_timedelta={self.last_build_timedelta}"
         )
@@ -0,0 +1,69 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+# Compares the CPU time spent parsing the feeds of the sources file by feedparser and by the
+# fast parser, as used by parse_rss:
+#
+#   SOURCES_FILE=sources.en_US python lib/parser-benchmark.py
+
+import csv
+import statistics
+import time
+
+import feedparser
+
+from aggregator import fast_parser
+from aggregator.async_fetcher import fetch_feeds
+from config import get_config
+
+config = get_config()
+
+MAX_ENTRIES = 20
+ROUNDS = 5
+
+
+def get_cpu_time(parse, data):
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        parse(data)
+    return (time.process_time() - start) / ROUNDS
+
+
+def parse_fast(data):
+    try:
+        return fast_parser.parse(data, MAX_ENTRIES)
+    except Exception:
+        return feedparser.parse(data)
+
+
+def is_fast_parsed(data):
+    try:
+        fast_parser.parse(data, MAX_ENTRIES)
+        return True
+    except Exception:
+        return False
+
+
+with open(f"{config.sources_dir / config.sources_file}.csv") as f:
+    feed_urls = [row["Feed"] for row in csv.DictReader(f) if row["Status"] == "Enabled"]
+
+print(f"Downloading {len(feed_urls)} feeds...")
+feeds = [
+    result["feed_cache"]
+    for result in fetch_feeds({feed_url: {} for feed_url in feed_urls})
+]
+
+feedparser_times = [get_cpu_time(feedparser.parse, data) for data in feeds]
+fast_times = [get_cpu_time(parse_fast, data) for data in feeds]
+fast_parsed = sum(is_fast_parsed(data) for data in feeds)
+
+print(f"Feeds: {len(feeds)}, parsed by the fast parser: {fast_parsed}")
+for name, times in (("feedparser", feedparser_times), ("fast parser", fast_times)):
+    print(
+        f"{name}: total {sum(times):.2f} s, "
+        f"mean {statistics.mean(times) * 1000:.2f} ms/feed, "
+        f"median {statistics.median(times) * 1000:.2f} ms/feed"
+    )
+print(f"Speedup: {sum(feedparser_times) / sum(fast_times):.1f}x")
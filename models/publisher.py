@@ -28,6 +28,7 @@ class PublisherBase(Model):
     max_entries: int = Field(default=20)
     creative_instance_id: str = Field(default="", alias="Creative Instance ID")
     content_type: str = Field(default="article", alias="Content Type")
+    url_rules: Optional[List[str]] = Field(default=None, alias="URL Rules")
     publisher_id: str = ""
 
     @root_validator(pre=True)
@@ -64,6 +65,10 @@ class PublisherBase(Model):
             raise ValueError("must contain a value")
         return v.split(";")
 
+    @validator("url_rules", pre=True)
+    def fix_url_rules_format(cls, v: str) -> Optional[List[str]]:
+        return v.split(";") if v else None
+
     @validator("publisher_id", pre=True, always=True)
     def add_publisher_id(cls, v: str, values: Dict[str, Any]) -> str:
         return hashlib.sha256(
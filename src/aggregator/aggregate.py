@@ -1,13 +1,21 @@
+import threading
 import time
 from collections import defaultdict
+from datetime import datetime
 from functools import partial
 from multiprocessing import Pool as ProcessPool
 from multiprocessing.pool import ThreadPool
 from pathlib import Path
 
 import orjson
+import pytz
 import structlog
 
+from aggregator import http_client
+from aggregator.article_index import ArticleIndex
+from aggregator.async_fetcher import iter_fetched_feeds
+from aggregator.circuit_breaker import FeedCircuitBreaker
+from aggregator.db_writer import DBWriter
 from aggregator.external_services import (
     get_external_channels_for_article,
     get_popularity_score,
@@ -19,10 +27,18 @@ from aggregator.image_fetcher import (
     process_image,
 )
 from aggregator.image_processor_sandboxed import get_image_with_max_size
-from aggregator.parser import download_feed, parse_rss, score_entries
-from aggregator.processor import process_articles, scrub_html, unshorten_url
+from aggregator.parser import parse_rss, score_entries
+from aggregator.processor import (
+    is_within_publish_window,
+    process_feed_batch,
+    scrub_html,
+    unshorten_url,
+)
+from aggregator.scheduler import FeedScheduler
+from aggregator.state_store import StateStore
 from config import get_config
-from db_crud import insert_external_channels, update_or_insert_article
+from db_crud import get_feed_update_records, insert_feed_lastbuild
+from db_engine import get_pool_stats
 
 config = get_config()
 logger = structlog.get_logger()
@@ -34,6 +50,18 @@ class Aggregator:
         self.feeds = defaultdict(dict)
         self.publishers: dict = _publishers
         self.output_path: Path = _output_path
+        # holds the validators, last poll and processed entries of each feed across runs
+        self.feed_state = StateStore(
+            f"feed_state{str(config.sources_file).replace('sources', '')}"
+        )
+        # holds the final URL of the article links resolved in the previous runs
+        self.unshorten_cache = StateStore(
+            f"unshorten_cache{str(config.sources_file).replace('sources', '')}"
+        )
+        # writes the articles and their cache hits and channels off the critical path
+        self.db_writer = DBWriter(str(config.sources_file).replace("sources.", ""))
+        self.feed_validators = {}
+        self.cached_feeds = []
 
     def check_images(self, items):
         """
@@ -78,38 +106,165 @@ class Aggregator:
 
         return out_items
 
+    def get_feed_validators(self, feed_url):
+        """
+        Returns the validators of the previous download of a feed, if we still hold the
+        entries it produced. Without them, a not modified feed could not be served.
+        """
+        state = self.feed_state.get(feed_url)
+        if not state.get("entries"):
+            return {}
+
+        return {
+            "etag": state.get("etag"),
+            "last_modified": state.get("last_modified"),
+            "content_hash": state.get("content_hash"),
+        }
+
+    def get_due_feeds(self):
+        """
+        Returns the keys of the feeds to poll in this run. The others are collected in
+        `self.cached_feeds`, to serve the entries of the previous run.
+        """
+        scheduler = FeedScheduler(
+            self.feed_state,
+            get_feed_update_records(
+                [self.publishers[key]["publisher_id"] for key in self.publishers]
+            ),
+        )
+        due_feeds = []
+        for key in self.publishers:
+            if scheduler.is_due(key, self.publishers[key]["publisher_id"]):
+                due_feeds.append(key)
+            else:
+                self.cached_feeds.append(key)
+
+        self.report["not_due_feeds"] = len(self.cached_feeds)
+        return due_feeds
+
+    def iter_fetched_feeds(self, slots: threading.Semaphore):
+        """
+        Downloads the feeds due for polling, yielding the ones that changed since the previous
+        run as soon as they are downloaded.
+
+        Feeds that are not due for polling, or did not change since the previous run, are
+        collected in `self.cached_feeds` instead. Feeds that keep failing to download are
+        skipped by the circuit breaker.
+
+        Args:
+            slots (threading.Semaphore): Held by each yielded feed until it is parsed.
+        """
+        self.feed_state.load()
+        self.cached_feeds = []
+        circuit_breaker = FeedCircuitBreaker(self.feed_state)
+        due_feeds = [
+            key for key in self.get_due_feeds() if not circuit_breaker.is_open(key)
+        ]
+        polled_at = datetime.utcnow().isoformat()
+        fetched_feeds = set()
+
+        logger.info(f"Downloading {len(due_feeds)} of {len(self.publishers)} feeds...")
+        for result in iter_fetched_feeds(
+            {
+                key: {
+                    "validators": self.get_feed_validators(key),
+                    "working_url": self.feed_state.get(key).get("working_url"),
+                }
+                for key in due_feeds
+            },
+            config.feed_pipeline_size,
+        ):
+            fetched_feeds.add(result["key"])
+            circuit_breaker.record_success(result["key"])
+            self.feed_state.update(
+                result["key"],
+                last_polled=polled_at,
+                working_url=result["working_url"],
+            )
+            if result["not_modified"]:
+                self.cached_feeds.append(result["key"])
+                continue
+            self.feed_validators[result["key"]] = result["validators"]
+            slots.acquire()
+            yield {
+                **result,
+                "max_entries": self.publishers[result["key"]]["max_entries"],
+            }
+
+        for key in due_feeds:
+            if key not in fetched_feeds:
+                circuit_breaker.record_failure(key)
+                # re-learn the scheme and redirect target of the feed on its next poll
+                self.feed_state.update(key, working_url=None)
+        self.report["circuit_breaker"] = circuit_breaker.get_report()
+
+        self.report["not_modified_feeds"] = (
+            len(self.cached_feeds) - self.report["not_due_feeds"]
+        )
+        logger.info(
+            f"Skipped {len(self.cached_feeds)} not due or not modified feeds..."
+        )
+
     def download_feeds(self):
         """
-        Downloads feeds from the publishers and parses them.
+        Downloads feeds from the publishers and parses them, as a pipeline: each feed is
+        parsed as soon as it is downloaded, while the other downloads go on. At most
+        `config.feed_pipeline_size` feeds wait to be parsed.
 
-        Returns:
-            feed_cache (dict): A dictionary containing the parsed feeds, with the publisher's key as the key and
-            the parsed feed as the value.
+        Yields:
+            dict: The parsed feeds, with the publisher's key as "key" and the parsed feed
+            as "feed_cache".
         """
-        downloaded_feeds = []
-        feed_cache = {}
-        logger.info(f"Downloading {len(self.publishers)} feeds...")
-        with ThreadPool(config.thread_pool_size) as pool:
+        last_build_times = []
+        slots = threading.BoundedSemaphore(config.feed_pipeline_size)
+        # The pool pulls the downloads from its own thread, so it can't be shared with the
+        # processing stage: the tasks of the latter would wait behind the downloads.
+        with ProcessPool(config.concurrency) as pool:
             for result in pool.imap_unordered(
-                download_feed,
-                [self.publishers[key]["feed_url"] for key in self.publishers],
+                parse_rss, self.iter_fetched_feeds(slots)
             ):
-                if not result:
-                    continue
-                downloaded_feeds.append(result)
-
-        with ProcessPool(config.concurrency) as pool:
-            for result in pool.imap_unordered(parse_rss, downloaded_feeds):
+                slots.release()
                 if not result:
                     continue
 
                 self.report["feed_stats"][result["key"]] = result["report"]
-                feed_cache[result["key"]] = result["feed_cache"]
-                self.feeds[
-                    self.publishers[result["key"]]["publisher_id"]
-                ] = self.publishers[result["key"]]
+                self.feeds[self.publishers[result["key"]]["publisher_id"]] = (
+                    self.publishers[result["key"]]
+                )
+                if result["last_build_time"]:
+                    last_build_times.append(
+                        (
+                            self.publishers[result["key"]]["publisher_id"],
+                            result["last_build_time"],
+                        )
+                    )
+                yield result
+
+        logger.info(
+            f"Recording the last build time of {len(last_build_times)} feeds..."
+        )
+        with ThreadPool(config.thread_pool_size) as thread_pool:
+            thread_pool.starmap(insert_feed_lastbuild, last_build_times)
+
+    def get_cached_entries(self):
+        """
+        Returns the processed entries of the previous run for the feeds that were not polled
+        or did not change, dropping the ones that are now too old to be shown.
+        """
+        entries = []
+        for key in self.cached_feeds:
+            state = self.feed_state.get(key)
+            for entry in state["entries"]:
+                publish_time = pytz.utc.localize(
+                    datetime.strptime(entry["publish_time"], "%Y-%m-%d %H:%M:%S")
+                )
+                if is_within_publish_window(publish_time, entry["content_type"]):
+                    entries.append(dict(entry))
 
-        return feed_cache
+            self.report["feed_stats"][key] = state["report"]
+            self.feeds[self.publishers[key]["publisher_id"]] = self.publishers[key]
+
+        return entries
 
     def normalize_pop_score(self, articles):
         max_pop_score = max(articles, key=lambda x: x["pop_score"])["pop_score"]
@@ -142,43 +297,89 @@ class Aggregator:
         processed_articles = []
         self.report["feed_stats"] = {}
 
-        feed_cache = self.download_feeds()
+        batches = []
+        batch = []
+        batch_size = 0
+        with ProcessPool(config.concurrency) as pool:
+            for result in self.download_feeds():
+                key = result["key"]
+                articles = result["feed_cache"]["entries"][
+                    : self.publishers[key]["max_entries"]
+                ]
+                batch.append(
+                    (key, self.publishers[key], result["feed_cache"]["feed"], articles)
+                )
+                batch_size += len(articles)
+                if batch_size >= config.process_batch_size:
+                    batches.append(pool.apply_async(process_feed_batch, (batch,)))
+                    batch = []
+                    batch_size = 0
+            if batch:
+                batches.append(pool.apply_async(process_feed_batch, (batch,)))
 
-        logger.info(
-            f"Fixing up and extracting the data for the items in {len(feed_cache)} feeds..."
-        )
-        for key in feed_cache:
-            logger.debug(f"processing: {key}")
-            start_time = time.time()
-            with ProcessPool(config.concurrency) as pool:
-                for out_item in pool.imap_unordered(
-                    partial(
-                        process_articles,
-                        _publisher=self.publishers[key],
-                        feed_info=feed_cache[key]["feed"],
-                    ),
-                    feed_cache[key]["entries"][: self.publishers[key]["max_entries"]],
-                ):
-                    if out_item:
-                        raw_entries.append(out_item)
-                    self.report["feed_stats"][key]["size_after_insert"] += 1
-            end_time = time.time()
-            logger.debug(
-                f"processed {key} in {round((end_time - start_time) * 1000)} ms"
+            logger.info(
+                f"Fixing up and extracting the data for the items in {len(batches)} batches of feeds..."
             )
+            for processed_batch in batches:
+                for key, out_items in processed_batch.get():
+                    feed_entries = []
+                    for out_item in out_items:
+                        if out_item:
+                            raw_entries.append(out_item)
+                            feed_entries.append(dict(out_item))
+                        self.report["feed_stats"][key]["size_after_insert"] += 1
+                    self.feed_state.update(
+                        key,
+                        entries=feed_entries,
+                        report=self.report["feed_stats"][key],
+                        **self.feed_validators[key],
+                    )
+
+        raw_entries.extend(self.get_cached_entries())
 
         logger.info(f"Un-shorten the URL of {len(raw_entries)}")
+        self.unshorten_cache.load()
+        article_index = ArticleIndex(
+            str(config.sources_file).replace("sources.", "")
+        ).load()
+        publishers_by_id = {
+            publisher["publisher_id"]: publisher
+            for publisher in self.publishers.values()
+        }
         with ThreadPool(config.thread_pool_size) as pool:
             for result, processed_article in pool.imap_unordered(
-                unshorten_url, raw_entries
+                partial(
+                    unshorten_url,
+                    publishers=publishers_by_id,
+                    cache=self.unshorten_cache,
+                    article_index=article_index,
+                ),
+                raw_entries,
             ):
                 if result:
                     entries.append(result)
                 if processed_article:
                     processed_articles.append(processed_article)
 
+        self.unshorten_cache.retain(
+            link
+            for link, cached in self.unshorten_cache.data.items()
+            if time.time() - cached["resolved_at"] < config.unshorten_cache_ttl
+        )
+        self.unshorten_cache.save()
+        article_index.flush(self.db_writer)
         raw_entries.clear()
 
+        # Links to the same article share their canonical URL hash: keep one entry per hash
+        # before fetching their scores and images, the one the final dedupe would keep.
+        unique_entries = {}
+        for entry in sorted(
+            entries, key=lambda entry: entry["publish_time"], reverse=True
+        ):
+            unique_entries[entry["url_hash"]] = entry
+        logger.info(f"Dropped {len(entries) - len(unique_entries)} duplicate entries")
+        entries = list(unique_entries.values())
+
         logger.info(f"Getting the Popularity score the URL of {len(entries)}")
         with ThreadPool(config.thread_pool_size) as pool:
             for result in pool.imap_unordered(get_popularity_score, entries):
@@ -207,24 +408,28 @@ class Aggregator:
 
         1. Retrieves RSS entries using the `get_rss` method.
         2. Checks and fixes images for each entry using the `check_images` method.
-        3. Scrubs HTML content in parallel using a `ProcessPool` and the `scrub_html` function.
+        3. Scrubs HTML content using the `scrub_html` function.
         4. Removes duplicate entries based on the `url_hash` field.
         5. Sorts the entries based on the `publish_time` field in descending order.
         6. Calculates scores for each entry using the `score_entries` function.
+        7. Queues the scored entries for the database, and starts writing them along with the
+           cache hits queued by `get_rss`, see `close_db_writer`.
 
         Returns a list of filtered entries.
         """
-        filtered_entries = []
         entries, processed_articles = self.get_rss()
 
         logger.info(f"Getting images for {len(entries)} items...")
         fixed_entries = self.check_images(entries)
         entries.clear()
+        # the last process pools of the run are forked by now
+        self.db_writer.start()
 
         logger.info(f"Scrubbing {len(fixed_entries)} items...")
-        with ProcessPool(config.concurrency) as pool:
-            for result in pool.imap_unordered(scrub_html, fixed_entries):
-                filtered_entries.append(result)
+        # In-process, as most values are skipped or memoised, which is cheaper than sending
+        # the entries to a pool and back. The copies leave the entries sent for their external
+        # channels unchanged.
+        filtered_entries = [scrub_html(dict(entry)) for entry in fixed_entries]
 
         # Add already processed articles
         filtered_entries.extend(processed_articles)
@@ -238,13 +443,8 @@ class Aggregator:
 
         filtered_entries = score_entries(sorted_entries)
 
-        logger.info("Insert articles into the database.")
-        locale_name = str(config.sources_file).replace("sources.", "")
-        with ThreadPool(config.thread_pool_size) as pool:
-            pool.map(
-                partial(update_or_insert_article, locale=locale_name),
-                filtered_entries,
-            )
+        logger.info("Queueing the articles for the database.")
+        self.db_writer.put_articles(filtered_entries)
 
         # Getting external channels for articles
         if str(config.sources_file) == "sources.en_US":
@@ -255,7 +455,7 @@ class Aggregator:
                 for article, ext_channels, api_raw_data in pool.imap_unordered(
                     get_external_channels_for_article, fixed_entries
                 ):
-                    insert_external_channels(
+                    self.db_writer.put_external_channels(
                         article["url_hash"],
                         article["title"],
                         ext_channels,
@@ -271,3 +471,17 @@ class Aggregator:
         with open(self.output_path, "wb") as _f:
             feeds = self.aggregate_rss()
             _f.write(orjson.dumps(feeds))
+
+        self.report["http_connections"] = http_client.get_connection_stats()
+
+        self.feed_state.retain(self.publishers)
+        self.feed_state.save()
+
+    def close_db_writer(self):
+        """
+        Waits for the records queued for the database to be written, e.g. once the feed is
+        published, and adds the stats of the writes to the report.
+        """
+        logger.info("Waiting for the database writes...")
+        self.report["db_writer"] = self.db_writer.close()
+        self.report["db_pool"] = get_pool_stats()
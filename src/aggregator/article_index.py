@@ -0,0 +1,72 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import structlog
+
+from config import get_config
+from db_crud import get_article_hash, get_recent_articles, increment_cache_hits
+
+config = get_config()
+logger = structlog.getLogger(__name__)
+
+
+class ArticleIndex:
+    """
+    The articles already stored for the feeds of a locale, loaded in a few queries so that
+    looking up each processed article is a dict lookup rather than a round trip to the
+    database.
+
+    The cache hits of the articles found are counted in memory, and written at once by
+    `flush`, or queued to a `DBWriter`.
+    """
+
+    def __init__(self, locale: str):
+        self.locale = locale
+        self.articles: Dict[str, Tuple[int, dict]] = {}
+        self.cache_hits: Counter = Counter()
+        self.lock = threading.Lock()
+
+    def load(self) -> "ArticleIndex":
+        """
+        Loads the articles published within the last `config.article_index_days` days.
+        """
+        since = datetime.utcnow() - timedelta(days=config.article_index_days)
+        self.articles = get_recent_articles(self.locale, since)
+        logger.info(f"Loaded {len(self.articles)} stored articles for {self.locale}")
+        return self
+
+    def get(self, url_hash: str, title: str) -> Optional[dict]:
+        """
+        Returns the stored data of an article, as `db_crud.get_article` does, counting a
+        cache hit if it is found.
+        """
+        article = self.articles.get(get_article_hash(url_hash, title))
+        if article is None:
+            return None
+
+        article_id, article_data = article
+        with self.lock:
+            self.cache_hits[article_id] += 1
+        return dict(article_data)
+
+    def flush(self, db_writer=None):
+        """
+        Writes the cache hits counted since the last flush, or queues them to `db_writer`.
+        """
+        with self.lock:
+            cache_hits = dict(self.cache_hits)
+            self.cache_hits.clear()
+
+        if not cache_hits:
+            return
+        if db_writer is not None:
+            db_writer.put_cache_hits(cache_hits)
+        else:
+            increment_cache_hits(cache_hits, self.locale)
@@ -0,0 +1,278 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import asyncio
+import queue
+import threading
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+import structlog
+
+from aggregator.parser import (
+    PUBLISHER_URL_ERR_ALERT_NAME_METRIC,
+    get_candidate_urls,
+    get_conditional_headers,
+    get_validators,
+    get_working_url,
+    registry,
+    ua,
+)
+from config import get_config
+from utils import push_metrics_to_pushgateway
+
+config = get_config()
+logger = structlog.getLogger(__name__)
+
+_DONE = object()  # marks the end of the downloads in the queue
+
+
+async def request_with_max_size(
+    session: aiohttp.ClientSession,
+    url: str,
+    max_bytes: Optional[int],
+    extra_headers: Optional[Dict[str, str]] = None,
+) -> Tuple[int, bytes, Mapping[str, str], str]:
+    """
+    Request a URL, aborting the download as soon as the content gets too large.
+
+    Args:
+        session (aiohttp.ClientSession): The session to make the request with.
+        url (str): The URL to get the content from.
+        max_bytes (Optional[int]): The maximum size of the content in bytes.
+        extra_headers (Optional[Dict[str, str]]): Headers to send on top of the defaults.
+
+    Returns:
+        Tuple[int, bytes, Mapping[str, str], str]: The status code, content and headers of the
+        response, and the URL to request directly next time.
+
+    Raises:
+        aiohttp.ClientError: If there is an HTTP error with the URL.
+        ValueError: If the content size exceeds the maximum size.
+    """
+    headers = {
+        "User-Agent": ua.random,
+        **config.default_headers,
+        **(extra_headers or {}),
+    }
+
+    async with session.get(url, headers=headers) as response:
+        response.raise_for_status()
+
+        if response.status not in (200, 304):
+            raise aiohttp.ClientResponseError(
+                response.request_info,
+                response.history,
+                status=response.status,
+                message=f"HTTP error with status code {response.status}",
+            )
+
+        content_length = response.headers.get("Content-Length")
+        if max_bytes is not None and content_length and int(content_length) > max_bytes:
+            raise ValueError("Content-Length too large")
+
+        content = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            content += chunk
+            if max_bytes is not None and len(content) > max_bytes:
+                raise ValueError("Content too large")
+
+        working_url = get_working_url(
+            url,
+            str(response.url),
+            [redirect.status for redirect in response.history],
+        )
+        return response.status, bytes(content), response.headers, working_url
+
+
+async def conditional_get_with_max_size(
+    session: aiohttp.ClientSession,
+    url: str,
+    validators: Dict[str, str],
+    max_bytes: Optional[int] = config.max_content_size,
+) -> Tuple[Optional[bytes], Dict[str, str], str]:
+    """
+    Get the content of a URL, unless it did not change since the validators were recorded.
+
+    Args:
+        session (aiohttp.ClientSession): The session to make the request with.
+        url (str): The URL to get the content from.
+        validators (Dict[str, str]): The validators of the previous download, if any.
+        max_bytes (Optional[int], optional): The maximum size of the content in bytes. Default is 10MB.
+
+    Returns:
+        Tuple[Optional[bytes], Dict[str, str], str]: The content, or None if it is not modified,
+        the validators of the response and the URL to request directly next time.
+
+    Raises:
+        aiohttp.ClientError: If there is an HTTP error with the URL.
+        ValueError: If the content size exceeds the maximum size.
+    """
+    status_code, content, headers, working_url = await request_with_max_size(
+        session, url, max_bytes, get_conditional_headers(validators)
+    )
+    if status_code == 304:
+        return None, validators, working_url
+
+    new_validators = get_validators(headers, content)
+    if new_validators["content_hash"] == validators.get("content_hash"):
+        return None, new_validators, working_url
+
+    return content, new_validators, working_url
+
+
+async def fetch_feed(
+    session: aiohttp.ClientSession,
+    feed: str,
+    validators: Optional[Dict[str, str]] = None,
+    max_feed_size: int = 10000000,
+    working_url: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Downloads a feed from the given URL, starting with the URL that worked last time.
+
+    Args:
+        session (aiohttp.ClientSession): The session to make the requests with.
+        feed (str): The URL of the feed to download.
+        validators (Optional[Dict[str, str]]): The validators of the previous download. When
+            given, the feed is reported as not modified if the server answers 304 or the
+            content hash matches.
+        max_feed_size (int): The maximum size of the feed to download. Defaults to 10000000.
+        working_url (Optional[str]): The URL the feed was downloaded from last time, tried
+            first. Otherwise the feed URL is tried, then the feed URL over plain HTTP.
+
+    Returns:
+        A dictionary containing the downloaded feed data, the key of the feed, its validators,
+        whether it was not modified since the previous download and the URL to try first next time.
+        Returns None if there is an error while downloading the feed.
+    """
+    validators = validators or {}
+    error = None
+    for feed_url in get_candidate_urls(feed, working_url):
+        try:
+            data, new_validators, working_url = await conditional_get_with_max_size(
+                session, feed_url, validators, max_feed_size
+            )
+            logger.debug(f"Downloaded feed: {feed_url}")
+            break
+        except Exception as e:
+            error = e
+    else:
+        logger.error(f"Failed to get [{error!r}]: {feed}")
+        prom_label = urlparse(feed).hostname.replace(".", "_")
+        await asyncio.to_thread(
+            push_metrics_to_pushgateway,
+            PUBLISHER_URL_ERR_ALERT_NAME_METRIC,
+            1,
+            prom_label,
+            registry,
+        )
+        return None
+
+    return {
+        "feed_cache": data,
+        "key": feed,
+        "validators": new_validators,
+        "not_modified": data is None,
+        "working_url": working_url,
+    }
+
+
+def get_client_session() -> aiohttp.ClientSession:
+    """
+    Creates the session shared by all the feed downloads of a run.
+
+    The connector caps the number of connections in flight, overall and per host, and the
+    timeouts follow the ones of `requests`: they apply to connecting and to each read, not to
+    the whole download.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=config.feed_fetch_concurrency,
+        limit_per_host=config.feed_fetch_per_host_limit,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        sock_connect=config.request_timeout,
+        sock_read=config.request_timeout,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def _enqueue_fetched_feeds(
+    feeds: Dict[str, Dict[str, Any]], fetched_feeds: queue.Queue, max_queued: int
+):
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max_queued or len(feeds))
+
+    def release_slot():
+        try:
+            loop.call_soon_threadsafe(slots.release)
+        except RuntimeError:
+            pass  # the loop is closed once all the downloads are over
+
+    async def fetch(session, feed_url, kwargs):
+        # a slot is held from the start of the download until the feed is consumed
+        await slots.acquire()
+        try:
+            result = await fetch_feed(session, feed_url, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        if result:
+            fetched_feeds.put((result, release_slot))
+        else:
+            slots.release()
+
+    async with get_client_session() as session:
+        await asyncio.gather(
+            *(fetch(session, feed_url, kwargs) for feed_url, kwargs in feeds.items())
+        )
+
+
+def iter_fetched_feeds(
+    feeds: Dict[str, Dict[str, Any]], max_queued: int = 0
+) -> Iterator[Dict[str, Any]]:
+    """
+    Downloads all the given feeds concurrently on an event loop in a background thread,
+    yielding each feed as soon as it is downloaded.
+
+    Args:
+        feeds (Dict[str, Dict[str, Any]]): The URL of each feed to download, with the arguments
+        of `fetch_feed` for it: the validators of its previous download and its working URL.
+        max_queued (int): The maximum number of feeds being downloaded or waiting to be
+        consumed. The other downloads only start once there is room. Unbounded by default.
+
+    Yields:
+        Dict[str, Any]: The downloaded feeds, in the format of `fetch_feed`, in the order they
+        complete. The feeds that failed to download are left out.
+    """
+    fetched_feeds = queue.Queue()
+    errors = []
+
+    def run():
+        try:
+            asyncio.run(_enqueue_fetched_feeds(feeds, fetched_feeds, max_queued))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            fetched_feeds.put(_DONE)
+
+    threading.Thread(target=run, name="feed-fetcher", daemon=True).start()
+    for result, release_slot in iter(fetched_feeds.get, _DONE):
+        release_slot()
+        yield result
+
+    if errors:
+        raise errors[0]
+
+
+def fetch_feeds(feeds: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Downloads all the given feeds concurrently on a single event loop.
+
+    See `iter_fetched_feeds`, of which this collects the feeds once they are all downloaded.
+    """
+    return list(iter_fetched_feeds(feeds))
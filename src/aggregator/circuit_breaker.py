@@ -0,0 +1,65 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from typing import Dict
+
+from aggregator.state_store import StateStore
+from config import get_config
+
+config = get_config()
+
+
+class FeedCircuitBreaker:
+    """
+    Skips the feeds that keep failing to download, so that dead feeds don't burn a timeout
+    on every run.
+
+    After `config.feed_failure_threshold` consecutive failures, a feed is skipped for a number
+    of runs that doubles with each further failure, up to `config.feed_max_skip_runs`. The
+    feed is then probed once, and a successful download resets it.
+
+    Args:
+        feed_state (StateStore): The state of the feeds, holding the failures of each one.
+    """
+
+    def __init__(self, feed_state: StateStore):
+        self.feed_state = feed_state
+
+    def is_open(self, feed_url: str) -> bool:
+        """
+        Checks if a feed has to be skipped in this run, counting the run as skipped if so.
+        """
+        skip_runs = self.feed_state.get(feed_url).get("skip_runs", 0)
+        if skip_runs > 0:
+            self.feed_state.update(feed_url, skip_runs=skip_runs - 1)
+            return True
+        return False
+
+    def record_success(self, feed_url: str):
+        if self.feed_state.get(feed_url).get("failures"):
+            self.feed_state.update(feed_url, failures=0, skip_runs=0)
+
+    def record_failure(self, feed_url: str):
+        failures = self.feed_state.get(feed_url).get("failures", 0) + 1
+        skip_runs = 0
+        if failures >= config.feed_failure_threshold:
+            skip_runs = min(
+                2 ** (failures - config.feed_failure_threshold),
+                config.feed_max_skip_runs,
+            )
+        self.feed_state.update(feed_url, failures=failures, skip_runs=skip_runs)
+
+    def get_report(self) -> Dict[str, Dict[str, int]]:
+        """
+        Returns the consecutive failures and the runs left to skip of every failing feed.
+        """
+        return {
+            feed_url: {
+                "failures": state["failures"],
+                "skip_runs": state.get("skip_runs", 0),
+            }
+            for feed_url, state in self.feed_state.data.items()
+            if state.get("failures")
+        }
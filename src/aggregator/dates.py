@@ -0,0 +1,65 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_tz
+from functools import lru_cache
+from typing import Optional
+
+import dateparser
+
+# the time zones parsedate_tz knows, which other parsers read the same way
+RFC822_TIME_ZONE = re.compile(
+    r"\s(?:[+-]\d{4}|UTC?|GMT|Z|[ECMPA][SD]T)$", re.IGNORECASE
+)
+
+
+def parse_iso_date(value: str) -> Optional[datetime]:
+    """
+    Parses an ISO 8601 date, e.g. 2024-05-06T10:00:00Z, or one in the format of the publish
+    times of the articles, e.g. 2024-05-06 10:00:00.
+    """
+    if value[-1:] in ("Z", "z"):
+        value = f"{value[:-1]}+00:00"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def parse_rfc822_date(value: str) -> Optional[datetime]:
+    """
+    Parses an RFC 822 date with a time zone, e.g. Mon, 06 May 2024 10:00:00 GMT.
+    """
+    if not RFC822_TIME_ZONE.search(value):
+        return None  # no time zone, or one parsedate_tz would read as UTC
+
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    try:
+        return datetime(*parsed[:6], tzinfo=timezone(timedelta(seconds=parsed[9] or 0)))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=10000)
+def parse_date(value: str) -> Optional[datetime]:
+    """
+    Parses a date as found in the feeds.
+
+    The formats most feeds use are parsed directly, and dateparser handles the others. The
+    result is memoised, as many entries share the same dates.
+
+    Args:
+        value (str): The date to parse.
+
+    Returns:
+        Optional[datetime]: The date, aware if it has a time zone, or None if it can't be parsed.
+    """
+    value = value.strip()
+    return parse_iso_date(value) or parse_rfc822_date(value) or dateparser.parse(value)
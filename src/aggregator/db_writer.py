@@ -0,0 +1,149 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import structlog
+from prometheus_client import Gauge, Histogram
+
+from config import get_config
+from db_crud import increment_cache_hits, insert_all_external_channels, upsert_articles
+
+config = get_config()
+logger = structlog.getLogger(__name__)
+
+# the kinds of records written by the writer
+ARTICLE = "article"
+CACHE_HITS = "cache_hits"
+EXTERNAL_CHANNELS = "external_channels"
+
+DB_WRITE_QUEUE_DEPTH_METRIC = Gauge(
+    "db_write_queue_depth",
+    "Records waiting to be written to the database",
+    multiprocess_mode="livemax",
+)
+DB_WRITE_LAG_METRIC = Histogram(
+    "db_write_lag_seconds",
+    "Time between the queueing of a record and its write to the database",
+)
+
+
+class DBWriter:
+    """
+    Writes the records of a locale to the database from a background thread, in batches, so
+    that the aggregation does not wait for the database.
+
+    The queue is bounded: the stages queueing records wait once it is full. The thread only
+    runs from `start`, which must come after the process pools are forked, so that no child
+    inherits it mid-write: the few records queued before must fit in the queue. `close`
+    waits for the records queued before it to be written.
+    """
+
+    def __init__(self, locale: str, max_size: Optional[int] = None):
+        self.locale = locale
+        self.queue: queue.Queue = queue.Queue(max_size or config.db_write_queue_size)
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+        self.stats: Counter = Counter()
+        self.max_lag = 0.0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="db-writer", daemon=True
+                )
+                self.thread.start()
+
+    def put(self, kind: str, record):
+        self.queue.put((kind, record, time.monotonic()))
+        self.stats["queued"] += 1
+        DB_WRITE_QUEUE_DEPTH_METRIC.set(self.queue.qsize())
+
+    def put_articles(self, articles: List[dict]):
+        for article in articles:
+            self.put(ARTICLE, article)
+
+    def put_cache_hits(self, cache_hits: Dict[int, int]):
+        self.put(CACHE_HITS, cache_hits)
+
+    def put_external_channels(self, url_hash, title, external_channels, raw_data):
+        self.put(EXTERNAL_CHANNELS, (url_hash, title, external_channels, raw_data))
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < config.db_batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [item for item in batch if item is not None]
+            if records:
+                try:
+                    self.write(records)
+                except Exception as e:
+                    logger.error(f"Error writing {len(records)} records: {e}")
+                    self.stats["failed"] += len(records)
+            DB_WRITE_QUEUE_DEPTH_METRIC.set(self.queue.qsize())
+
+            if batch[-1] is None:
+                return
+
+    def write(self, records: list):
+        """
+        Writes a batch of records, the articles first as the other records refer to them.
+
+        Only the records which were saved are counted as written, the others as failed.
+        """
+        records_by_kind = defaultdict(list)
+        for record in records:
+            records_by_kind[record[0]].append(record)
+
+        written = []
+        for kind, write in (
+            (ARTICLE, lambda articles: upsert_articles(articles, self.locale)),
+            (
+                CACHE_HITS,
+                lambda cache_hits: increment_cache_hits(
+                    sum(map(Counter, cache_hits), Counter()), self.locale
+                ),
+            ),
+            (EXTERNAL_CHANNELS, insert_all_external_channels),
+        ):
+            kind_records = records_by_kind[kind]
+            if not kind_records:
+                continue
+            if write([record for _, record, _ in kind_records]):
+                written.extend(kind_records)
+            else:
+                self.stats["failed"] += len(kind_records)
+
+        written_at = time.monotonic()
+        for _, _, queued_at in written:
+            lag = written_at - queued_at
+            DB_WRITE_LAG_METRIC.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+        self.stats["written"] += len(written)
+        self.stats["batches"] += 1
+
+    def close(self) -> Dict[str, float]:
+        """
+        Waits for the queued records to be written, and returns the stats of the writer.
+        """
+        if self.stats["queued"]:
+            self.start()
+        with self.lock:
+            if self.thread is not None:
+                self.queue.put(None)
+                self.thread.join()
+                self.thread = None
+
+        return {**self.stats, "max_lag_seconds": round(self.max_lag, 3)}
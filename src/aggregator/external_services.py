@@ -1,20 +1,59 @@
+from typing import Optional
+
 import orjson
 import requests
 import structlog
 from google.cloud import language_v1
+from requests import HTTPError, RequestException
 
-from aggregator.parser import get_with_max_size
+from aggregator import http_client
+from aggregator.parser import ua
 from config import get_config
 from ext_article_categorization.taxonomy_mapping import (
     EXTERNAL_AUGMENT_CHANNELS,
     EXTERNAL_DEFAULT_CHANNELS,
     get_channels_for_classification,
 )
+from utils import read_with_max_size
 
 config = get_config()
 logger = structlog.getLogger(__name__)
 
 
+def get_with_max_size(
+    url: str, max_bytes: Optional[int] = config.max_content_size
+) -> bytes:
+    """
+    Get the content of a URL, raising an exception if the content is too large.
+
+    Args:
+        url (str): The URL to get the content from.
+        max_bytes (Optional[int], optional): The maximum size of the content in bytes. Default is 10MB.
+
+    Returns:
+        bytes: The content of the URL.
+
+    Raises:
+        HTTPError: If there is an HTTP error with the URL.
+        ValueError: If the content size exceeds the maximum size.
+    """
+    headers = {"User-Agent": ua.random, **config.default_headers}
+
+    try:
+        with http_client.get(
+            url, timeout=config.request_timeout, headers=headers, stream=True
+        ) as response:
+            response.raise_for_status()
+
+            if response.status_code != 200:
+                raise HTTPError(f"HTTP error with status code {response.status_code}")
+
+            return read_with_max_size(response, max_bytes)
+
+    except RequestException as e:
+        raise HTTPError(f"Failed to make request: {e}")
+
+
 def get_popularity_score(_article):
     """
     Calculate the popularity score for an article.
@@ -75,7 +114,7 @@ def get_predicted_channels(_article):
         return _article
 
     try:
-        response = requests.post(
+        response = http_client.post(
             url=config.nu_api_url,
             json=[_article],
             headers={"Authorization": f"Bearer {config.nu_api_token}"},
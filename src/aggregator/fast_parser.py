@@ -0,0 +1,195 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import re
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from feedparser.datetimes import _parse_date
+from lxml import etree
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+MEDIA = "{http://search.yahoo.com/mrss/}"
+
+# Constructs feedparser handles beyond plain XML: DTD entities, relative URIs to resolve and
+# markup its sanitizer drops along with the content.
+UNSUPPORTED_MARKUP = re.compile(
+    rb"<!DOCTYPE|xml:base|(?:<|&lt;|&#60;)(?:script|style)", re.IGNORECASE
+)
+
+# feed level date fields, by tag
+FEED_DATES = {
+    "lastBuildDate": "updated",
+    "pubDate": "published",
+    DC + "date": "updated",
+    ATOM + "updated": "updated",
+    ATOM + "published": "published",
+}
+
+
+class UnsupportedFeedError(ValueError):
+    """
+    Raised for the feeds that have to be parsed by feedparser instead.
+    """
+
+
+def get_text(element: etree._Element) -> str:
+    if len(element):
+        # XHTML content, or markup that is not escaped
+        raise UnsupportedFeedError(f"Unexpected markup in {element.tag}")
+    return (element.text or "").strip()
+
+
+def set_date(fields: Dict[str, Any], key: str, element: etree._Element):
+    value = get_text(element)
+    fields.setdefault(key, value)
+    fields.setdefault(f"{key}_parsed", _parse_date(value))
+
+
+def add_media(entry: Dict[str, Any], element: etree._Element):
+    if element.tag == MEDIA + "content":
+        entry["media_content"].append(dict(element.attrib))
+    elif element.tag == MEDIA + "thumbnail":
+        entry["media_thumbnail"].append(dict(element.attrib))
+    elif element.tag == MEDIA + "group":
+        for child in element:
+            add_media(entry, child)
+
+
+def add_atom_link(entry: Dict[str, Any], element: etree._Element):
+    rel = element.get("rel", "alternate")
+    if rel == "alternate":
+        entry.setdefault("link", element.get("href", "").strip())
+    elif rel == "enclosure":
+        entry["enclosures"].append(
+            {
+                "href": element.get("href", ""),
+                "length": element.get("length", ""),
+                "type": element.get("type", ""),
+            }
+        )
+
+
+def parse_entry(element: etree._Element) -> Dict[str, Any]:  # noqa: C901
+    """
+    Extracts the fields `process_articles` reads from an RSS item or an Atom entry, under the
+    names feedparser gives them.
+    """
+    entry = {
+        "media_content": [],
+        "media_thumbnail": [],
+        "enclosures": [],
+    }
+    content = []
+    categories = []
+    guid = None
+
+    for child in element:
+        tag = child.tag
+        if tag in ("title", ATOM + "title"):
+            entry["title"] = get_text(child)
+        elif tag == "link":
+            entry["link"] = get_text(child)
+        elif tag == ATOM + "link":
+            add_atom_link(entry, child)
+        elif tag == "guid" and child.get("isPermaLink", "true") == "true":
+            guid = get_text(child)
+        elif tag in ("description", ATOM + "summary"):
+            entry["summary"] = get_text(child)
+        elif tag in (CONTENT + "encoded", ATOM + "content"):
+            content.append({"type": "text/html", "value": get_text(child)})
+        elif tag in ("pubDate", ATOM + "published"):
+            set_date(entry, "published", child)
+        elif tag in (DC + "date", ATOM + "updated"):
+            set_date(entry, "updated", child)
+        elif tag == "category":
+            categories.append(get_text(child))
+        elif tag == ATOM + "category":
+            categories.append(child.get("term", ""))
+        elif tag == "enclosure":
+            entry["enclosures"].append(
+                {
+                    "href": child.get("url", ""),
+                    "length": child.get("length", ""),
+                    "type": child.get("type", ""),
+                }
+            )
+        elif tag.startswith(MEDIA):
+            add_media(entry, child)
+
+    if "link" not in entry and guid:
+        entry["link"] = guid
+    if content:
+        entry["content"] = content
+        entry.setdefault("summary", content[0]["value"])
+    if "summary" in entry:
+        entry["description"] = entry["summary"]
+    if categories:
+        entry["category"] = categories[0]
+
+    return entry
+
+
+def parse(data: bytes, max_entries: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Parses a well-formed RSS 2.0 or Atom feed in a single streaming pass, extracting only the
+    fields the aggregator reads.
+
+    The document is decoded after its XML declaration, and parsing stops once `max_entries`
+    entries are read.
+
+    Args:
+        data (bytes): The content of the feed.
+        max_entries (Optional[int]): The number of entries to read. Defaults to all of them.
+
+    Returns:
+        Dict[str, Any]: The feed in the shape of feedparser's result: the dates of the feed under
+        "feed" and the entries under "entries".
+
+    Raises:
+        UnsupportedFeedError: If the feed is not an RSS 2.0 or Atom feed feedparser would parse
+            the same way.
+        etree.XMLSyntaxError: If the feed is not well-formed.
+    """
+    if UNSUPPORTED_MARKUP.search(data):
+        raise UnsupportedFeedError("Markup handled by feedparser only")
+
+    feed_info: Dict[str, Any] = {}
+    entries: List[Dict[str, Any]] = []
+    context = etree.iterparse(
+        BytesIO(data),
+        events=("start", "end"),
+        remove_comments=True,
+        remove_pis=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+
+    _, root = next(context)
+    if root.tag == "rss":
+        entry_tag, feed_tag = "item", "channel"
+    elif root.tag == ATOM + "feed":
+        entry_tag, feed_tag = ATOM + "entry", root.tag
+    else:
+        raise UnsupportedFeedError(f"Unsupported feed format: {root.tag}")
+
+    for event, element in context:
+        if event != "end":
+            continue
+
+        if element.tag == entry_tag:
+            entries.append(parse_entry(element))
+            # free the entries already read
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            if max_entries is not None and len(entries) >= max_entries:
+                break
+        elif element.tag in FEED_DATES and element.getparent().tag == feed_tag:
+            set_date(feed_info, FEED_DATES[element.tag], element)
+
+    return {"feed": feed_info, "entries": entries}
@@ -0,0 +1,185 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from functools import lru_cache
+from html.entities import html5
+from html.parser import HTMLParser
+from typing import List, Tuple
+
+# the whitespace BeautifulSoup collapses, and the tags in which it doesn't
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+PRESERVE_WHITESPACE_TAGS = {"pre", "textarea"}
+
+# the tags without end tag, and the ones whose text is not part of the text of the document
+EMPTY_ELEMENT_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "keygen",
+    "link",
+    "menuitem",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+    "basefont",
+    "bgsound",
+    "command",
+    "frame",
+    "image",
+    "isindex",
+    "nextid",
+    "spacer",
+}
+HIDDEN_TEXT_TAGS = {"rt", "rp", "style", "script", "template"}
+
+# the named character references, with and without their semicolon
+ENTITIES = {name.rstrip(";"): char for name, char in html5.items()}
+
+
+class HTMLExtractor(HTMLParser):
+    """
+    Extracts the text of an HTML fragment and the source of its first image in a single pass.
+
+    The results are the ones of BeautifulSoup with the html.parser builder, i.e. of
+    `get_text()` and of the `src` of the first `img` tag that has one, without building the
+    tree: the parser only tracks the open tags, for the whitespace and the hidden text.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.text: List[str] = []
+        self.img_src = None
+        self.data: List[str] = []
+        self.open_tags: List[str] = []
+        self.closed_empty_tags: List[str] = []
+        self.preserve_whitespace = 0
+        self.hidden_text: List[str] = []
+
+    def end_data(self, is_cdata: bool = False):
+        if not self.data:
+            return
+        data = "".join(self.data)
+        self.data = []
+
+        # CDATA sections are part of the text, even in the tags whose text is hidden
+        if is_cdata or not self.hidden_text:
+            if not self.preserve_whitespace and not data.strip(ASCII_SPACES):
+                data = "\n" if "\n" in data else " "
+            self.text.append(data)
+
+    def push_tag(self, name: str):
+        self.open_tags.append(name)
+        if name in PRESERVE_WHITESPACE_TAGS:
+            self.preserve_whitespace += 1
+        if name in HIDDEN_TEXT_TAGS:
+            self.hidden_text.append(name)
+
+    def pop_tag(self, name: str):
+        if name not in self.open_tags:
+            return
+        while self.open_tags:
+            tag = self.open_tags.pop()
+            if tag in PRESERVE_WHITESPACE_TAGS:
+                self.preserve_whitespace -= 1
+            if tag in HIDDEN_TEXT_TAGS:
+                self.hidden_text.pop()
+            if tag == name:
+                break
+
+    def handle_starttag(self, tag, attrs, is_empty_element=True):
+        self.end_data()
+        if tag == "img" and self.img_src is None:
+            for name, value in attrs:
+                if name == "src":
+                    self.img_src = value or ""  # the last one, as BeautifulSoup keeps
+
+        self.push_tag(tag)
+        if is_empty_element and tag in EMPTY_ELEMENT_TAGS:
+            self.handle_endtag(tag, is_closed=False)
+            self.closed_empty_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs, is_empty_element=False)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag, is_closed=True):
+        if is_closed and tag in self.closed_empty_tags:
+            self.closed_empty_tags.remove(tag)  # the end tag of an empty element
+            return
+        self.end_data()
+        self.pop_tag(tag)
+
+    def handle_data(self, data):
+        self.data.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in ("x", "X"):
+            code = int(name.lstrip("xX"), 16)
+        else:
+            code = int(name)
+
+        data = None
+        if code < 256:
+            # references to windows-1252 code points are read as such
+            try:
+                data = bytes([code]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self.handle_data(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self.handle_data(ENTITIES.get(name, f"&{name}"))
+
+    def handle_comment(self, data):
+        self.end_data()
+
+    def handle_decl(self, decl):
+        self.end_data()
+
+    def handle_pi(self, data):
+        self.end_data()
+
+    def unknown_decl(self, data):
+        self.end_data()
+        if data.upper().startswith("CDATA["):
+            self.data.append(data[len("CDATA[") :])
+            self.end_data(is_cdata=True)
+
+
+@lru_cache(maxsize=1024)
+def extract_html(fragment: str) -> Tuple[str, str]:
+    """
+    Extracts the text of an HTML fragment and the source of its first image.
+
+    Fragments without markup are returned as they are, and the result is memoised, as the
+    description and summary of an entry are often the same.
+
+    Args:
+        fragment (str): The HTML fragment, e.g. the title or the description of an entry.
+
+    Returns:
+        Tuple[str, str]: The text of the fragment, and the source of its first image, or an
+        empty string if it has none.
+    """
+    if "<" not in fragment and "&" not in fragment and fragment.strip(ASCII_SPACES):
+        return fragment, ""
+
+    extractor = HTMLExtractor()
+    extractor.feed(fragment)
+    extractor.close()
+    extractor.end_data()
+    return "".join(extractor.text), extractor.img_src or ""
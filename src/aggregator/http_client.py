@@ -0,0 +1,108 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import os
+import threading
+from collections import Counter
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from config import get_config
+
+config = get_config()
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    An adapter keeping a keep-alive connection pool per host, which also counts the
+    connections it created and the requests made over them.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.disposed_stats = Counter()
+        pools = self.poolmanager.pools
+        dispose_func = pools.dispose_func
+
+        def dispose(pool):
+            # keep the stats of the pools evicted from the LRU
+            self.disposed_stats.update(self._get_pool_stats(pool))
+            dispose_func(pool)
+
+        pools.dispose_func = dispose
+
+    @staticmethod
+    def _get_pool_stats(pool) -> Dict[str, int]:
+        return {
+            "connections_created": pool.num_connections,
+            "requests": pool.num_requests,
+        }
+
+    def get_stats(self) -> Counter:
+        stats = Counter(self.disposed_stats)
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                stats.update(self._get_pool_stats(pool))
+        return stats
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the session shared by every outbound call of the process.
+
+    The session is created again after a fork, since its connections cannot be shared with
+    the parent process.
+    """
+    global _session, _session_pid
+
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            # Size the pools after the thread pools, so that every thread can keep a
+            # connection open to the same host, e.g. the popularity endpoint.
+            adapter = PooledHTTPAdapter(
+                pool_connections=config.http_pool_connections,
+                pool_maxsize=config.thread_pool_size,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING  # br if available
+            # Calls are independent of each other, so the shared jar keeps no cookies. The
+            # cookies set along the redirects of a call are still sent on, as requests
+            # follows them with a jar of its own for the call.
+            session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+            _session, _session_pid = session, os.getpid()
+
+        return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return get_session().get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return get_session().post(url, **kwargs)
+
+
+def get_connection_stats() -> Dict[str, int]:
+    """
+    Returns the number of connections created and reused by the session of the process.
+    """
+    stats = get_session().get_adapter("https://").get_stats()
+    return {
+        "connections_created": stats["connections_created"],
+        "connections_reused": stats["requests"] - stats["connections_created"],
+        "requests": stats["requests"],
+    }
@@ -9,11 +9,11 @@ from urllib.parse import urlparse
 
 import metadata_parser
 import structlog
-from bs4 import BeautifulSoup as BS
 from fake_useragent import UserAgent
 from PIL import Image
 
 from aggregator import image_processor_sandboxed
+from aggregator.html_extractor import extract_html
 from config import get_config
 
 ua = UserAgent(browsers=["edge", "chrome", "firefox", "safari", "opera"])
@@ -89,22 +89,12 @@ def get_article_img(article: Dict) -> str:  # noqa: C901
                 return image_url
 
     if "summary" in article:
-        soup = BS(article["summary"], features="html.parser")
-        image_tags = soup.find_all("img")
-        for img_tag in image_tags:
-            if "src" in img_tag.attrs:
-                image_url = img_tag["src"]
-                break
+        _, image_url = extract_html(article["summary"])
         if image_url:
             return image_url
 
     if "content" in article:
-        soup = BS(article["content"][0]["value"], features="html.parser")
-        image_tags = soup.find_all("img")
-        for img_tag in image_tags:
-            if "src" in img_tag.attrs:
-                image_url = img_tag["src"]
-                break
+        _, image_url = extract_html(article["content"][0]["value"])
         if image_url:
             return image_url
 
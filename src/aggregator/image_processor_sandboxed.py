@@ -8,14 +8,14 @@ import os
 import struct
 
 import boto3
-import requests
 import structlog
 from fake_useragent import UserAgent
 from wasmer import Instance, Module, Store, engine
 from wasmer_compiler_cranelift import Compiler
 
+from aggregator import http_client
 from config import get_config
-from utils import upload_file
+from utils import read_with_max_size, upload_file
 
 ua = UserAgent(browsers=["edge", "chrome", "firefox", "safari", "opera"])
 
@@ -93,6 +93,9 @@ def get_image_with_max_size(item, max_bytes=1000000):
     """
     Retrieves the content of a URL and checks if it exceeds a maximum size.
 
+    The download is streamed and aborted once it exceeds `config.max_content_size`, in which
+    case the image is dropped.
+
     Args:
         item (dict): The URL to retrieve the content from.
         max_bytes (int, optional): The maximum size in bytes allowed for the content. Defaults to 1000000.
@@ -102,24 +105,19 @@ def get_image_with_max_size(item, max_bytes=1000000):
         is larger than the maximum size.
     """
     try:
-        is_large = False
-
         if item.get("img").endswith(config.video_extensions):
             return item, "", False
 
-        response = requests.get(
+        with http_client.get(
             item.get("img"),
             timeout=config.request_timeout,
             headers={"User-Agent": ua.random, **config.default_headers},
-        )
-        response.raise_for_status()
-        if (
-            response.headers.get("Content-Length")
-            and int(response.headers.get("Content-Length")) > max_bytes
-        ):
-            is_large = True
-
-        return item, response.content, is_large
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            content = read_with_max_size(response, config.max_content_size)
+
+        return item, content, len(content) > max_bytes
     except Exception as e:
         logger.info(f"Error retrieving image from URL {item.get('url')}: {e}")
         return item, "", False
@@ -3,22 +3,21 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this file,
 # You can obtain one at https://mozilla.org/MPL/2.0/. */
 
+import hashlib
 import logging
 import math
 import warnings
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
 
-import dateparser
 import feedparser
-import requests
 import structlog
-from better_profanity import profanity
 from fake_useragent import UserAgent
 from prometheus_client import CollectorRegistry, Gauge, multiprocess
-from requests import HTTPError, RequestException
 
+from aggregator import fast_parser
+from aggregator.dates import parse_date
 from config import get_config
 from utils import push_metrics_to_pushgateway
 
@@ -36,9 +35,23 @@ warnings.filterwarnings(
 
 logger = structlog.getLogger(__name__)
 
-# adding custom bad words for profanity check
-custom_badwords = ["vibrators", "hedonistic"]
-profanity.add_censor_words(custom_badwords)
+# the fields of the feed and its entries read by process_articles, besides the first content
+FEED_FIELDS = ("updated", "published")
+ENTRY_FIELDS = (
+    "title",
+    "link",
+    "url",
+    "updated",
+    "published",
+    "description",
+    "summary",
+    "image",
+    "urlToImage",
+    "media_content",
+    "media_thumbnail",
+    "enclosures",
+    "category",
+)
 
 registry = CollectorRegistry()
 multiprocess.MultiProcessCollector(registry)
@@ -60,94 +73,140 @@ PUBLISHER_URL_ERR_ALERT_NAME_METRIC = Gauge(
 )
 
 
-def get_with_max_size(
-    url: str, max_bytes: Optional[int] = config.max_content_size
-) -> bytes:
+def get_working_url(url: str, final_url: str, redirect_statuses: List[int]) -> str:
+    """
+    Returns the URL to request directly next time: the target of the redirects if they are all
+    permanent, the requested URL otherwise.
+    """
+    if redirect_statuses and all(status in (301, 308) for status in redirect_statuses):
+        return final_url
+    return url
+
+
+def get_candidate_urls(feed: str, working_url: Optional[str] = None) -> List[str]:
     """
-    Get the content of a URL, raising an exception if the content is too large.
+    Returns the URLs to try in order to download a feed: the one that worked last time, then
+    the feed URL, then the feed URL over plain HTTP.
+    """
+    http_url = urlunparse(urlparse(feed)._replace(scheme="http"))
+    return list(dict.fromkeys(url for url in (working_url, feed, http_url) if url))
+
+
+def get_conditional_headers(validators: Dict[str, str]) -> Dict[str, str]:
+    """
+    Builds the conditional request headers for the validators of the previous download.
 
     Args:
-        url (str): The URL to get the content from.
-        max_bytes (Optional[int], optional): The maximum size of the content in bytes. Default is 10MB.
+        validators (Dict[str, str]): The validators recorded for the feed.
 
     Returns:
-        bytes: The content of the URL.
+        Dict[str, str]: The If-None-Match/If-Modified-Since headers to send.
+    """
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
 
-    Raises:
-        HTTPError: If there is an HTTP error with the URL.
-        ValueError: If the content size exceeds the maximum size.
+
+def get_validators(headers: Mapping[str, str], content: bytes) -> Dict[str, str]:
     """
-    headers = {"User-Agent": ua.random, **config.default_headers}
+    Extracts the validators of a downloaded feed, to send them back on the next run.
 
-    try:
-        with requests.get(
-            url, timeout=config.request_timeout, headers=headers
-        ) as response:
-            response.raise_for_status()
+    Args:
+        headers (Mapping[str, str]): The headers of the response.
+        content (bytes): The content of the response.
 
-            if response.status_code != 200:
-                raise HTTPError(f"HTTP error with status code {response.status_code}")
+    Returns:
+        Dict[str, str]: The ETag, Last-Modified and the hash of the content.
+    """
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(content).hexdigest(),
+    }
 
-            content_length = response.headers.get("Content-Length")
-            if (
-                max_bytes is not None
-                and content_length
-                and int(content_length) > max_bytes
-            ):
-                raise ValueError("Content-Length too large")
 
-            return response.content
+def get_last_build_time(parsed_feed: Dict[str, Any]) -> Optional[datetime]:
+    """
+    Returns when a feed last published something.
 
-    except RequestException as e:
-        raise HTTPError(f"Failed to make request: {e}")
+    The newest entry is preferred over the updated field of the feed, as many feeds bump the
+    latter on every request.
 
+    Args:
+        parsed_feed (Dict[str, Any]): The feed parsed by feedparser.
 
-def download_feed(feed: str, max_feed_size: int = 10000000) -> Optional[Dict[str, str]]:
+    Returns:
+        Optional[datetime]: The naive UTC time of the last build, or None if unknown.
     """
-    Downloads a feed from the given URL.
+    build_times = [
+        entry.get("updated_parsed") or entry.get("published_parsed")
+        for entry in parsed_feed.get("entries", [])
+    ]
+    build_times = [build_time for build_time in build_times if build_time]
+    if not build_times:
+        feed_info = parsed_feed.get("feed", {})
+        build_times = [
+            feed_info.get("updated_parsed") or feed_info.get("published_parsed")
+        ]
+
+    last_build_time = max(build_times, default=None)
+    if not last_build_time:
+        return None
+
+    return datetime(*last_build_time[:6])
+
+
+def get_compact_fields(
+    item: Mapping[str, Any], fields: Tuple[str, ...]
+) -> Dict[str, Any]:
+    # feedparser's dicts resolve aliases, e.g. description to summary, on lookup
+    return {field: item[field] for field in fields if field in item}
+
+
+def get_compact_feed(
+    parsed_feed: Mapping[str, Any], max_entries: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Returns the parts of a parsed feed that `process_articles` reads, as plain dicts, to keep
+    them cheap to send to the other processes.
 
     Args:
-        feed: The URL of the feed to download.
-        max_feed_size: The maximum size of the feed to download. Defaults to 10000000.
+        parsed_feed (Mapping[str, Any]): The feed parsed by feedparser or `fast_parser`.
+        max_entries (Optional[int]): The number of entries to keep. Defaults to all of them.
 
     Returns:
-        A dictionary containing the downloaded feed data and the key of the feed.
-        Returns None if there is an error while downloading the feed.
-
-    Raises:
-        ReadTimeout: If the download times out.
-        HTTPError: If there is an HTTP error while downloading the feed.
+        Dict[str, Any]: The dates of the feed under "feed" and its entries under "entries".
     """
-    try:
-        data = get_with_max_size(feed, max_feed_size)
-        logger.debug(f"Downloaded feed: {feed}")
-    except Exception:
-        # Failed to get feed. I will try plain HTTP.
-        try:
-            u = urlparse(feed)
-            u = u._replace(scheme="http")
-            feed_url = urlunparse(u)
-            data = get_with_max_size(feed_url, max_feed_size)
-        except Exception as e:
-            logger.error(f"Failed to get [{e}]: {feed}")
-            prom_label = urlparse(feed).hostname
-            prom_label = prom_label.replace(".", "_")
-            push_metrics_to_pushgateway(
-                PUBLISHER_URL_ERR_ALERT_NAME_METRIC, 1, prom_label, registry
-            )
-            return None
+    entries = []
+    for entry in parsed_feed.get("entries", [])[:max_entries]:
+        compact_entry = get_compact_fields(entry, ENTRY_FIELDS)
+        if entry.get("content"):
+            compact_entry["content"] = [{"value": entry["content"][0]["value"]}]
+        entries.append(compact_entry)
 
-    return {"feed_cache": data, "key": feed}
+    return {
+        "feed": get_compact_fields(parsed_feed.get("feed", {}), FEED_FIELDS),
+        "entries": entries,
+    }
 
 
 def parse_rss(downloaded_feed):
     """
     Parses the downloaded RSS feed.
 
+    Well-formed RSS 2.0 and Atom feeds are parsed by `fast_parser`, up to "max_entries" entries,
+    the others by feedparser.
+
     Parameters:
-        downloaded_feed (dict): A dictionary containing the downloaded feed, with the keys "key" and "feed_cache".
+        downloaded_feed (dict): A dictionary containing the downloaded feed, with the keys "key" and "feed_cache",
+            and optionally "max_entries".
 
     Returns:
+        dict: The report of the feed, its key, its last build time and, as "feed_cache", the fields
+            of the feed read by `process_articles`, up to "max_entries" entries.
         None: If the feed fails to parse.
 
     Raises:
@@ -158,8 +217,12 @@ def parse_rss(downloaded_feed):
     url, data = downloaded_feed["key"], downloaded_feed["feed_cache"]
 
     try:
-        feed_cache = feedparser.parse(data)
-        report["size_after_get"] = len(feed_cache["items"])
+        try:
+            feed_cache = fast_parser.parse(data, downloaded_feed.get("max_entries"))
+        except Exception as e:
+            logger.debug(f"Falling back to feedparser [{e}]: {url}")
+            feed_cache = feedparser.parse(data)
+        report["size_after_get"] = len(feed_cache["entries"])
         if report["size_after_get"] == 0:
             logger.info(f"Read 0 articles from {url}")
             raise Exception(f"Read 0 articles from {url}")
@@ -172,17 +235,14 @@ def parse_rss(downloaded_feed):
         )
         return None
 
-    feed_cache = dict(feed_cache)  # bypass serialization issues
-
-    # TODO: insert feed updated into database in feed_lastbuild table
-
-    if "bozo_exception" in feed_cache:
-        del feed_cache["bozo_exception"]
-
-    if "bozo" in feed_cache:
-        del feed_cache["bozo"]
+    last_build_time = get_last_build_time(feed_cache)
 
-    return {"report": report, "feed_cache": feed_cache, "key": url}
+    return {
+        "report": report,
+        "feed_cache": get_compact_feed(feed_cache, downloaded_feed.get("max_entries")),
+        "key": url,
+        "last_build_time": last_build_time,
+    }
 
 
 def score_entries(entries):
@@ -198,10 +258,9 @@ def score_entries(entries):
     """
     out_entries = []
     variety_by_source = {}
+    now = datetime.utcnow()
     for entry in entries:
-        seconds_ago = (
-            datetime.utcnow() - dateparser.parse(entry["publish_time"])
-        ).total_seconds()
+        seconds_ago = (now - parse_date(entry["publish_time"])).total_seconds()
         recency = math.log(seconds_ago) if seconds_ago > 0 else 0.1
         if entry["publisher_id"] in variety_by_source:
             last_variety = variety_by_source[entry["publisher_id"]]
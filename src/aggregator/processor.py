@@ -5,17 +5,18 @@
 
 import hashlib
 import html
+import re
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
 from urllib.parse import quote, urljoin, urlparse, urlunparse
 
 import bleach
-import dateparser
 import pytz
 import requests
 import structlog
 import unshortenit
-from better_profanity import profanity
-from bs4 import BeautifulSoup as BS
 from fake_useragent import UserAgent
 from requests.exceptions import (
     ConnectTimeout,
@@ -25,7 +26,13 @@ from requests.exceptions import (
     TooManyRedirects,
 )
 
+from aggregator.article_index import ArticleIndex
+from aggregator.dates import parse_date
+from aggregator.html_extractor import extract_html
 from aggregator.image_fetcher import get_article_img
+from aggregator.profanity_filter import profanity_filter
+from aggregator.state_store import StateStore
+from aggregator.url_canonicalizer import canonicalize_url
 from config import get_config
 from db_crud import get_article
 
@@ -34,6 +41,60 @@ logger = structlog.getLogger(__name__)
 config = get_config()
 ua = UserAgent(browsers=["edge", "chrome", "firefox", "safari", "opera"])
 
+# the fields set by the aggregator itself, which never contain markup
+SAFE_FIELDS = {"url_hash", "publisher_id", "publish_time"}
+# the characters bleach changes in a string, markup and character references aside
+UNSAFE_CHARACTERS = re.compile(r"[\x00-\x08\x0b-\x1f<>&]")
+
+# the hosts of URL shorteners, redirect and tracking services, whose links are always resolved
+REDIRECT_DOMAINS = frozenset(
+    {
+        "amzn.to",
+        "apple.news",
+        "bit.ly",
+        "bitly.com",
+        "buff.ly",
+        "cutt.ly",
+        "dlvr.it",
+        "feedproxy.google.com",
+        "feeds.feedburner.com",
+        "fb.me",
+        "flip.it",
+        "go.redirectingat.com",
+        "goo.gl",
+        "ift.tt",
+        "is.gd",
+        "j.mp",
+        "lnkd.in",
+        "news.google.com",
+        "ow.ly",
+        "rebrand.ly",
+        "shorturl.at",
+        "t.co",
+        "tinyurl.com",
+        "trib.al",
+        "wp.me",
+    }
+)
+
+
+def is_within_publish_window(publish_time: datetime, content_type: str) -> bool:
+    """
+    Checks that an article is neither from the future nor too old to be shown.
+
+    Args:
+        publish_time (datetime): The UTC publish time of the article.
+        content_type (str): The content type of the publisher. Products are always shown.
+
+    Returns:
+        bool: True if the article should be kept.
+    """
+    if content_type == "product":
+        return True
+
+    now_utc = datetime.now().replace(tzinfo=pytz.utc) + timedelta(hours=1)
+    return now_utc - timedelta(days=60) <= publish_time <= now_utc
+
 
 def process_articles(article, _publisher, feed_info):  # noqa: C901
     """
@@ -55,11 +116,11 @@ def process_articles(article, _publisher, feed_info):  # noqa: C901
         # No title. Skip.
         return None
 
-    out_article["title"] = BS(article["title"], features="html.parser").get_text()
+    out_article["title"], _ = extract_html(article["title"])
     out_article["title"] = html.unescape(out_article["title"])
 
     # Filter the offensive articles
-    if profanity.contains_profanity(out_article.get("title").lower()):
+    if profanity_filter.contains_profanity(out_article.get("title").lower()):
         return None
 
     # Process article URL
@@ -76,13 +137,13 @@ def process_articles(article, _publisher, feed_info):  # noqa: C901
 
     # Process published time
     if article.get("updated"):
-        out_article["publish_time"] = dateparser.parse(article.get("updated"))
+        out_article["publish_time"] = parse_date(article.get("updated"))
     elif article.get("published"):
-        out_article["publish_time"] = dateparser.parse(article.get("published"))
+        out_article["publish_time"] = parse_date(article.get("published"))
     elif feed_info.get("updated"):
-        out_article["publish_time"] = dateparser.parse(feed_info.get("updated"))
+        out_article["publish_time"] = parse_date(feed_info.get("updated"))
     elif feed_info.get("published"):
-        out_article["publish_time"] = dateparser.parse(feed_info.get("published"))
+        out_article["publish_time"] = parse_date(feed_info.get("published"))
     else:
         return None  # skip (no update field)
 
@@ -94,12 +155,10 @@ def process_articles(article, _publisher, feed_info):  # noqa: C901
 
     out_article["publish_time"] = out_article["publish_time"].astimezone(pytz.utc)
 
-    now_utc = datetime.now().replace(tzinfo=pytz.utc) + timedelta(hours=1)
-    if _publisher["content_type"] != "product":
-        if out_article["publish_time"] > now_utc or out_article["publish_time"] < (
-            now_utc - timedelta(days=60)
-        ):
-            return None  # skip (newer than now() or older than 1 month)
+    if not is_within_publish_window(
+        out_article["publish_time"], _publisher["content_type"]
+    ):
+        return None  # skip (newer than now() or older than 1 month)
 
     out_article["publish_time"] = out_article["publish_time"].strftime(
         "%Y-%m-%d %H:%M:%S"
@@ -124,9 +183,8 @@ def process_articles(article, _publisher, feed_info):  # noqa: C901
     # Add some fields
     out_article["category"] = _publisher.get("category")
     if article.get("description"):
-        out_article["description"] = BS(
-            article["description"], features="html.parser"
-        ).get_text()
+        # usually the same as the summary, whose extraction was memoised for the image
+        out_article["description"], _ = extract_html(article["description"])
     else:
         out_article["description"] = ""
 
@@ -144,47 +202,150 @@ def process_articles(article, _publisher, feed_info):  # noqa: C901
     return out_article
 
 
-def unshorten_url(out_article):
+def process_feed_batch(batch):
     """
-    Unshortens a URL in the given output article.
+    Processes the entries of a batch of feeds, so that the feeds sent to the pool together
+    share the cost of a task.
+
+    Args:
+        batch (list): The feeds of the batch, as (key, publisher, feed info, entries) tuples.
+
+    Returns:
+        list: The key of each feed with its processed entries, None for the skipped ones.
+    """
+    return [
+        (key, [process_articles(entry, publisher, feed_info) for entry in entries])
+        for key, publisher, feed_info, entries in batch
+    ]
+
+
+def get_domain(host: str) -> str:
+    """
+    Returns a host without its www. prefix, lowercased.
+    """
+    host = host.lower()
+    return host[len("www.") :] if host.startswith("www.") else host
+
+
+def needs_unshortening(link: str, destination_domains: Iterable[str]) -> bool:
+    """
+    Checks if a link has to be resolved: if it's on a URL shortener, redirect or tracking
+    service, or isn't on one of the destination domains of its publisher.
+
+    Args:
+        link (str): The link of the article.
+        destination_domains (Iterable[str]): The domains of the publisher's articles.
+
+    Returns:
+        bool: True if the link has to be resolved, False if it is already the final URL.
+    """
+    domain = get_domain(urlparse(link).hostname or "")
+    if domain in REDIRECT_DOMAINS:
+        return True
+
+    for destination_domain in destination_domains:
+        destination_domain = get_domain(destination_domain.strip())
+        if destination_domain and (
+            domain == destination_domain or domain.endswith(f".{destination_domain}")
+        ):
+            return False
+
+    return True
+
+
+def get_cached_url(link: str, cache: Optional[StateStore]) -> Optional[str]:
+    """
+    Returns the final URL of a link resolved within the last `config.unshorten_cache_ttl`
+    seconds, or None.
+    """
+    if cache is None:
+        return None
+
+    cached = cache.get(link)
+    if time.time() - cached.get("resolved_at", 0) < config.unshorten_cache_ttl:
+        return cached.get("url")
+    return None
+
+
+def unshorten_url(
+    out_article,
+    publishers: Optional[Dict[str, dict]] = None,
+    cache: Optional[StateStore] = None,
+    article_index: Optional[ArticleIndex] = None,
+):
+    """
+    Unshortens a URL in the given output article, and hashes its canonical form.
+
+    Links already on one of the destination domains of the publisher are kept as they are, and
+    the final URLs of the other links are cached.
 
     Args:
         out_article (dict): The output article containing the URL to unshorten.
+        publishers (Optional[Dict[str, dict]]): The publishers by publisher ID, for their
+            destination domains and URL rules. Every link is resolved without them.
+        cache (Optional[StateStore]): The final URL of the links resolved in previous runs.
+        article_index (Optional[ArticleIndex]): The articles already stored, looked up instead
+            of querying the database for each article.
 
     Returns:
         dict or None: The modified output article with the unshortened URL, or None if unshortening failed.
     """
-    unshortener = unshortenit.UnshortenIt(
-        default_timeout=config.request_timeout,
-        default_headers={"User-Agent": ua.random},
-    )
+    link = out_article.get("link")
+    if not link:
+        return None, None  # skip (no link)
 
-    try:
-        out_article["url"] = unshortener.unshorten(out_article["link"])
-        out_article.pop("link", None)
-    except (
-        requests.exceptions.ConnectionError,
-        ConnectTimeout,
-        InvalidURL,
-        ReadTimeout,
-        SSLError,
-        TooManyRedirects,
-    ):
-        return None, None  # skip (unshortener failed)
-    except Exception as e:
-        logger.error(f"unshortener failed [{out_article.get('link')}]: {e}")
-        return None, None  # skip (unshortener failed)
+    publisher = (publishers or {}).get(out_article.get("publisher_id"), {})
+    if not needs_unshortening(link, publisher.get("destination_domains") or []):
+        url = link
+    else:
+        url = get_cached_url(link, cache)
 
-    url_hash = hashlib.sha256(out_article["url"].encode("utf-8")).hexdigest()
-    parts = urlparse(out_article["url"])
+    if url is None:
+        unshortener = unshortenit.UnshortenIt(
+            default_timeout=config.request_timeout,
+            default_headers={"User-Agent": ua.random},
+        )
+
+        try:
+            url = unshortener.unshorten(link)
+        except (
+            requests.exceptions.ConnectionError,
+            ConnectTimeout,
+            InvalidURL,
+            ReadTimeout,
+            SSLError,
+            TooManyRedirects,
+        ):
+            return None, None  # skip (unshortener failed)
+        except Exception as e:
+            logger.error(f"unshortener failed [{link}]: {e}")
+            return None, None  # skip (unshortener failed)
+
+        if cache is not None:
+            cache.update(link, url=url, resolved_at=time.time())
+
+    out_article.pop("link", None)
+
+    # The canonical URL only identifies the article: the resolved one is published, as the
+    # canonical one may not be served, e.g. without its trailing slash.
+    canonical_url = canonicalize_url(
+        url, publisher.get("url_rules") or config.url_canonicalization_rules
+    )
+    url_hash = hashlib.sha256(canonical_url.encode("utf-8")).hexdigest()
+    parts = urlparse(url)
     parts = parts._replace(path=quote(parts.path))
     encoded_url = urlunparse(parts)
     out_article["url"] = encoded_url
     out_article["url_hash"] = url_hash
 
-    processed_article = get_article(
-        url_hash, out_article["title"], str(config.sources_file).replace("sources.", "")
-    )
+    if article_index is not None:
+        processed_article = article_index.get(url_hash, out_article["title"])
+    else:
+        processed_article = get_article(
+            url_hash,
+            out_article["title"],
+            str(config.sources_file).replace("sources.", ""),
+        )
 
     if processed_article:
         return None, processed_article
@@ -192,23 +353,41 @@ def unshorten_url(out_article):
     return out_article, None
 
 
+@lru_cache(maxsize=10000)
+def scrub_value(value: str) -> str:
+    """
+    Scrubs the HTML of a string, memoised as many values repeat across articles, e.g. the
+    publisher names and categories.
+    """
+    return bleach.clean(value, strip=True).replace(
+        "&amp;", "&"
+    )  # workaround limitation in bleach
+
+
 def scrub_html(feed: dict):
     """
     Scrubs the HTML content in the given feed dictionary.
 
+    The fields set by the aggregator, the values that are not strings and the strings bleach
+    would leave unchanged are skipped.
+
     Parameters:
         feed (dict): The dictionary containing the HTML content to be scrubbed.
 
     Returns:
         dict: The modified feed dictionary with the HTML content scrubbed.
     """
-    for key in feed.keys():
+    for key, value in feed.items():
+        if (
+            key in SAFE_FIELDS
+            or not isinstance(value, str)
+            or not UNSAFE_CHARACTERS.search(value)
+        ):
+            continue
+
         try:
-            feed[key] = bleach.clean(feed[key], strip=True)
-            feed[key] = feed[key].replace(
-                "&amp;", "&"
-            )  # workaround limitation in bleach
+            feed[key] = scrub_value(value)
         except Exception:
-            feed[key] = feed[key]
+            feed[key] = value
 
     return feed
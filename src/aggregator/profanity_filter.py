@@ -0,0 +1,150 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from better_profanity.constants import ALLOWED_CHARACTERS
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+
+# adding custom bad words for profanity check
+custom_badwords = ["vibrators", "hedonistic"]
+
+# the characters that can stand for each letter of a swear word, as in better_profanity
+CHARS_MAPPING = {
+    "a": ("a", "@", "*", "4"),
+    "i": ("i", "*", "l", "1"),
+    "o": ("o", "*", "0", "@"),
+    "u": ("u", "*", "v"),
+    "v": ("v", "*", "u"),
+    "l": ("l", "1"),
+    "e": ("e", "*", "3"),
+    "s": ("s", "$", "5"),
+    "t": ("t", "7"),
+}
+
+
+def get_trie_pattern(words: Iterable[Tuple[str, ...]]) -> str:
+    """
+    Returns a regex matching any of the given words, factored by common prefix so that the
+    regex engine doesn't try every word in turn.
+
+    Args:
+        words (Iterable[Tuple[str, ...]]): The words, as the regex of each of their characters.
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}  # end of a word
+
+    def get_pattern(node: Dict[str, dict]) -> str:
+        alternatives = [
+            char + get_pattern(child) for char, child in sorted(node.items()) if char
+        ]
+        if not alternatives:
+            return ""
+        pattern = f"(?:{'|'.join(alternatives)})"
+        return f"{pattern}?" if "" in node else pattern
+
+    return get_pattern(trie)
+
+
+class ProfanityFilter:
+    """
+    Checks texts for swear words with the same verdicts as better_profanity, from a single
+    regex compiled once for the whole word list.
+
+    Like better_profanity, a text is split into words made of `ALLOWED_CHARACTERS`, and
+    profane if a word, or a word joined with the ones that follow it with or without the
+    separators in between, is a swear word or one of its variants, e.g. "sh1t" for "shit".
+
+    Args:
+        words (Iterable[str]): The swear words.
+        char_map (Dict[str, Tuple[str, ...]]): The characters that can stand for each letter
+            of a swear word, e.g. `CHARS_MAPPING`.
+    """
+
+    def __init__(self, words: Iterable[str], char_map: Dict[str, Tuple[str, ...]]):
+        words = {word.lower() for word in words}
+        self.max_length = max(len(word) for word in words)
+        # the number of next words to join to a word, after the swear word with the most
+        # separators in it
+        self.max_next_words = max(
+            1,
+            max(sum(char not in ALLOWED_CHARACTERS for char in word) for word in words),
+        )
+
+        char_patterns = {
+            char: f"[{''.join(re.escape(c) for c in chars)}]"
+            for char, chars in char_map.items()
+        }
+        self.swear_word_pattern = re.compile(
+            get_trie_pattern(
+                tuple(char_patterns.get(char) or re.escape(char) for char in word)
+                for word in words
+            )
+        )
+        self.word_pattern = re.compile(
+            f"[{''.join(re.escape(char) for char in sorted(ALLOWED_CHARACTERS))}]+"
+        )
+
+    def is_swear_word(self, word: str) -> bool:
+        word = word.lower()
+        return (
+            len(word) <= self.max_length
+            and self.swear_word_pattern.fullmatch(word) is not None
+        )
+
+    def get_words(self, text: str) -> List[Tuple[str, int, int]]:
+        """
+        Returns the words of a text with their start and end.
+        """
+        return [
+            (match.group(), match.start(), match.end())
+            for match in self.word_pattern.finditer(text)
+        ]
+
+    def contains_profanity(self, text: str) -> bool:
+        """
+        Checks if a text contains any swear word.
+        """
+        words = self.get_words(text)
+        # As in better_profanity, a one character word ending the text is only checked on
+        # its own, and not at all if it's the only word.
+        joinable_words = [word for word in words if word[1] < len(text) - 1]
+        if not joinable_words:
+            return False
+
+        for index, (word, start, end) in enumerate(words):
+            if self.is_swear_word(word):
+                return True
+
+            joined_word = joined_word_with_separators = word
+            for next_word, next_start, next_end in joinable_words[
+                index + 1 : index + 1 + self.max_next_words
+            ]:
+                joined_word += next_word
+                joined_word_with_separators += text[end:next_start] + next_word
+                if self.is_swear_word(joined_word) or self.is_swear_word(
+                    joined_word_with_separators
+                ):
+                    return True
+                end = next_end
+
+        return False
+
+
+def get_profanity_filter() -> ProfanityFilter:
+    """
+    Returns a filter for the word list of better_profanity and the custom bad words.
+    """
+    words = list(read_wordlist(get_complete_path_of_file("profanity_wordlist.txt")))
+    return ProfanityFilter(words + custom_badwords, CHARS_MAPPING)
+
+
+# compiled at import, before the worker processes are forked
+profanity_filter = get_profanity_filter()
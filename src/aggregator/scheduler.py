@@ -0,0 +1,80 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aggregator.state_store import StateStore
+from config import get_config
+
+config = get_config()
+
+
+class FeedScheduler:
+    """
+    Decides which feeds are due for polling in this run.
+
+    Feeds that published recently are polled every run. Feeds that have been idle for longer
+    than `config.feed_poll_idle_threshold` are polled less often, the longer they are idle,
+    up to once every `config.feed_max_poll_interval`.
+
+    Args:
+        feed_state (StateStore): The state of the feeds, holding when each one was last polled.
+        update_records (Dict[str, Dict[str, Any]]): The feed_update_record of each feed, by the
+            url_hash of the feed.
+        now (Optional[datetime]): The naive UTC time of the run. Defaults to now.
+    """
+
+    def __init__(
+        self,
+        feed_state: StateStore,
+        update_records: Dict[str, Dict[str, Any]],
+        now: Optional[datetime] = None,
+    ):
+        self.feed_state = feed_state
+        self.update_records = update_records
+        self.now = now or datetime.utcnow()
+
+    def get_poll_interval(self, update_record: Dict[str, Any]) -> timedelta:
+        """
+        Returns how long to wait between two polls of a feed.
+
+        Args:
+            update_record (Dict[str, Any]): The last build time of the feed, and the time
+                between its last two builds in seconds.
+
+        Returns:
+            timedelta: The poll interval, zero for feeds to poll every run.
+        """
+        idle_time = self.now - update_record["last_build_time"]
+        if idle_time < timedelta(seconds=config.feed_poll_idle_threshold):
+            return timedelta(0)
+
+        interval = min(idle_time / 4, timedelta(seconds=config.feed_max_poll_interval))
+        if update_record.get("last_build_timedelta"):
+            # don't wait longer than half the usual time between two builds of the feed
+            interval = min(
+                interval, timedelta(seconds=update_record["last_build_timedelta"] / 2)
+            )
+
+        return interval
+
+    def is_due(self, feed_url: str, url_hash: str) -> bool:
+        """
+        Checks if a feed has to be polled in this run.
+
+        Feeds without history, or whose entries of the previous run are not kept, are always due.
+        """
+        state = self.feed_state.get(feed_url)
+        update_record = self.update_records.get(url_hash)
+        if (
+            not update_record
+            or not state.get("entries")
+            or not state.get("last_polled")
+        ):
+            return True
+
+        last_polled = datetime.fromisoformat(state["last_polled"])
+        return self.now - last_polled >= self.get_poll_interval(update_record)
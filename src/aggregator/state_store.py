@@ -0,0 +1,72 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from typing import Any, Dict, Iterable
+
+import orjson
+import structlog
+
+from config import get_config
+from utils import download_file, upload_file
+
+config = get_config()
+logger = structlog.getLogger(__name__)
+
+
+class StateStore:
+    """
+    A small JSON key/value store that is kept across runs.
+
+    The file lives under `config.output_path / config.state_dir` and is mirrored to the
+    private S3 bucket, since the output dir does not outlive a single run.
+    """
+
+    def __init__(self, name: str):
+        self.file_name = f"{name}.json"
+        self.path = config.output_path / config.state_dir / self.file_name
+        self.s3_key = f"{config.state_dir}/{self.file_name}"
+        self.data: Dict[str, Dict[str, Any]] = {}
+
+    def load(self) -> "StateStore":
+        """
+        Loads the state of the previous run, starting empty if there is none.
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not config.no_download:
+            try:
+                download_file(str(self.path), config.private_s3_bucket, self.s3_key)
+            except Exception as e:
+                logger.error(f"Failed to download {self.s3_key}: {e}")
+
+        if self.path.is_file():
+            try:
+                with open(self.path, "rb") as f:
+                    self.data = orjson.loads(f.read())
+            except orjson.JSONDecodeError as e:
+                logger.error(f"Ignoring corrupted state file {self.path}: {e}")
+                self.data = {}
+
+        return self
+
+    def get(self, key: str) -> Dict[str, Any]:
+        return self.data.get(key, {})
+
+    def update(self, key: str, **fields):
+        self.data.setdefault(key, {}).update(fields)
+
+    def retain(self, keys: Iterable[str]):
+        """
+        Drops the state of every key not in `keys`, e.g. feeds removed from the sources.
+        """
+        keys = set(keys)
+        self.data = {key: value for key, value in self.data.items() if key in keys}
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(orjson.dumps(self.data))
+
+        if not config.no_upload:
+            upload_file(self.path, config.private_s3_bucket, self.s3_key)
@@ -0,0 +1,102 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from typing import Iterable, Optional
+from urllib.parse import ParseResult, urlparse, urlunparse
+
+# the query parameters that only track where a visit comes from, besides the utm_ ones
+TRACKING_PARAMS = frozenset(
+    {
+        "fbclid",
+        "gclid",
+        "dclid",
+        "msclkid",
+        "mc_cid",
+        "mc_eid",
+        "igshid",
+        "yclid",
+        "_ga",
+        "_hsenc",
+        "_hsmi",
+        "ocid",
+        "cmpid",
+    }
+)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# the canonicalization rules, to set in config.url_canonicalization_rules or per publisher
+NORMALIZE_HOST = "normalize_host"  # lowercase scheme and host, without the default port
+DROP_FRAGMENT = "drop_fragment"
+DROP_TRACKING_PARAMS = "drop_tracking_params"
+# for the publishers whose query strings never identify an article
+DROP_QUERY = "drop_query"
+STRIP_TRAILING_SLASH = "strip_trailing_slash"
+RULES = (
+    NORMALIZE_HOST,
+    DROP_FRAGMENT,
+    DROP_TRACKING_PARAMS,
+    DROP_QUERY,
+    STRIP_TRAILING_SLASH,
+)
+
+
+def is_tracking_param(param: str) -> bool:
+    name = param.split("=", 1)[0].lower()
+    return name.startswith("utm_") or name in TRACKING_PARAMS
+
+
+def get_normalized_netloc(parts: ParseResult, port: Optional[int]) -> str:
+    """
+    Returns the lowercased host of a URL, with its user info and without its default port.
+    """
+    netloc = parts.hostname
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6 address
+    if port is not None and port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        netloc = f"{netloc}:{port}"
+    userinfo = parts.netloc.rpartition("@")[0]
+    return f"{userinfo}@{netloc}" if userinfo else netloc
+
+
+def canonicalize_url(url: str, rules: Iterable[str]) -> str:
+    """
+    Normalizes the URL of an article, so that the links to the same article get the same hash.
+
+    Args:
+        url (str): The URL of the article.
+        rules (Iterable[str]): The rules to apply, from `RULES`.
+
+    Returns:
+        str: The canonical URL, or the URL as it is if it can't be parsed.
+    """
+    rules = set(rules)
+    try:
+        parts = urlparse(url)
+        port = parts.port
+    except ValueError:
+        return url
+
+    if NORMALIZE_HOST in rules and parts.hostname:
+        parts = parts._replace(
+            scheme=parts.scheme.lower(), netloc=get_normalized_netloc(parts, port)
+        )
+
+    if DROP_FRAGMENT in rules:
+        parts = parts._replace(fragment="")
+
+    if DROP_QUERY in rules:
+        parts = parts._replace(query="")
+    elif DROP_TRACKING_PARAMS in rules and parts.query:
+        params = [
+            param
+            for param in parts.query.split("&")
+            if param and not is_tracking_param(param)
+        ]
+        parts = parts._replace(query="&".join(params))
+
+    if STRIP_TRAILING_SLASH in rules and len(parts.path) > 1:
+        parts = parts._replace(path=parts.path.rstrip("/") or "/")
+
+    return urlunparse(parts)
@@ -0,0 +1,57 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import argparse
+import json
+from datetime import datetime, timedelta
+
+from db_crud import get_cache_hit_stats
+
+
+def parse_args(args=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Reports the cache hit rates of the articles created within a window."
+    )
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Start of the window, in UTC ISO format. Defaults to --hours ago.",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="End of the window, in UTC ISO format. Defaults to now.",
+    )
+    parser.add_argument(
+        "--hours",
+        type=float,
+        default=24,
+        help="Length of the window when --since is not given. Defaults to 24.",
+    )
+    parser.add_argument(
+        "--by-feed", action="store_true", help="Report each feed of each locale."
+    )
+    parser.add_argument("--locale", help="Only report this locale, e.g. en_US.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    until = args.until or datetime.utcnow()
+    since = args.since or until - timedelta(hours=args.hours)
+
+    stats = get_cache_hit_stats(
+        since, until, by_feed=args.by_feed, locale_name=args.locale
+    )
+    print(
+        json.dumps(
+            {"since": since.isoformat(), "until": until.isoformat(), "stats": stats},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
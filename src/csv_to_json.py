@@ -48,6 +48,7 @@ feed_include_keys = {
     "feed_url": True,
     "site_url": True,
     "destination_domains": True,
+    "url_rules": True,
 }
 
 
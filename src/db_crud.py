@@ -1,17 +1,18 @@
 import hashlib
 import json
-from copy import deepcopy
 from datetime import datetime, time
+from itertools import groupby
+from typing import Any, Dict, List, Tuple
 
 import orjson
 import pytz
 import structlog
-from sqlalchemy import func
+from sqlalchemy import and_, case, distinct, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from config import get_config
 from db.tables.article_cache_record_entity import ArticleCacheRecordEntity
 from db.tables.articles_entity import ArticleEntity
-from db.tables.base import feed_locale_channel
 from db.tables.channel_entity import ChannelEntity
 from db.tables.external_article_classification_entity import (
     ExternalArticleClassificationEntity,
@@ -20,175 +21,43 @@ from db.tables.feed_entity import FeedEntity
 from db.tables.feed_locales_entity import FeedLocaleEntity
 from db.tables.feed_update_record_entity import FeedUpdateRecordEntity
 from db.tables.locales_entity import LocaleEntity
-from db.tables.publsiher_entity import PublisherEntity
+from db_engine import get_session, session_scope
+from feed_map import get_feed_map
+from publisher_sync import sync_publishers
 
 config = get_config()
 logger = structlog.getLogger(__name__)
 
 
-def insert_or_get_publisher(session, publisher):
-    """
-    Insert a new publisher into the database
-    """
-    try:
-        # Create a new publisher entity
-        new_publisher = PublisherEntity(
-            name=publisher["publisher_name"],
-            url=publisher["site_url"],
-            favicon_url=publisher["favicon_url"],
-            cover_url=publisher["cover_url"],
-            background_color=publisher["background_color"],
-            enabled=publisher["enabled"],
-            score=publisher["score"],
-        )
-        session.add(new_publisher)
-        session.commit()
-        session.refresh(new_publisher)
-        return new_publisher
-    except Exception as e:
-        logger.error(e)
-        session.rollback()
-        return (
-            session.query(PublisherEntity).filter_by(url=publisher["site_url"]).first()
-        )
-
-
-def insert_or_get_locale(session, locale):
-    """
-    Insert a new locale into the database
-    """
-    try:
-        # Create a new locale entity
-        new_locale = LocaleEntity(
-            locale=locale,
-            name=locale,
-        )
-        session.add(new_locale)
-        session.commit()
-        session.refresh(new_locale)
-
-    except Exception as e:
-        logger.error(e)
-        session.rollback()
-        new_locale = session.query(LocaleEntity).filter_by(locale=locale).first()
-
-    return new_locale
-
-
-def insert_or_get_channel(session, channel):
-    """
-    Insert a new channel into the database
-    """
-    try:
-        new_channel = ChannelEntity(
-            name=channel,
-        )
-        session.add(new_channel)
-        session.commit()
-        session.refresh(new_channel)
-        return new_channel
-    except Exception as e:
-        logger.error(e)
-        session.rollback()
-        return session.query(ChannelEntity).filter_by(name=channel).first()
-
-
-def insert_or_get_feed(session, feed_data, publisher_id):
-    """
-    Insert a new feed into the database
-    """
-    try:
-        new_feed = FeedEntity(
-            url=feed_data["feed_url"],
-            url_hash=feed_data["publisher_id"],
-            publisher_id=publisher_id,
-            category=feed_data["category"],
-            enabled=feed_data["enabled"],
-            og_images=False,
-            max_entries=20,
-        )
-        session.add(new_feed)
-        session.commit()
-        session.refresh(new_feed)
-        return new_feed
-    except Exception as e:
-        logger.error(e)
-        session.rollback()
-        return (
-            session.query(FeedEntity)
-            .filter_by(url_hash=feed_data["publisher_id"])
-            .first()
-        )
-
-
-def insert_feed_locale(session, feed_id, locale_id, rank):
-    """
-    Insert a new feed_locale_channel into the database
-    """
-    try:
-        new_feed_locale = FeedLocaleEntity(
-            feed_id=feed_id,
-            locale_id=locale_id,
-            rank=rank,
-        )
-        session.add(new_feed_locale)
-        session.commit()
-        session.refresh(new_feed_locale)
-        return new_feed_locale
-    except Exception as e:
-        logger.error(e)
-        session.rollback()
-
-
 def insert_or_update_all_publishers():
     """
-    Insert or update all publishers in the database
+    Sync the publishers, feeds, locales and channels of the database with the global sources,
+    unless the sources are the same as at the last sync
     """
-    try:
-        with config.get_db_session() as db_session:
-            with open(f"{config.output_path / config.global_sources_file}") as f:
-                try:
-                    logger.info("Inserting publisher data")
-
-                    publishers_data_as_list = orjson.loads(f.read())
-                    publishers_data_as_list = publishers_data_as_list
-                    for publisher_data in publishers_data_as_list:
-                        publisher = insert_or_get_publisher(db_session, publisher_data)
-
-                        feed = insert_or_get_feed(
-                            db_session,
-                            publisher_data,
-                            publisher_id=publisher.id,
-                        )
+    # imported here, as it imports prometheus_client, which must not be imported before the
+    # configuration sets its multiprocess directory
+    from aggregator.state_store import StateStore
 
-                        for locale_item in publisher_data["locales"]:
-                            locale = insert_or_get_locale(
-                                db_session, locale_item["locale"]
-                            )
-
-                            feed_locale = insert_feed_locale(
-                                db_session, feed.id, locale.id, locale_item["rank"]
-                            )
-
-                            for channel_name in locale_item["channels"]:
-                                channel = insert_or_get_channel(
-                                    db_session, channel_name
-                                )
-
-                                try:
-                                    feed_locale.channels.append(channel)
-                                    db_session.commit()
-                                except Exception:
-                                    logger.error(
-                                        f"Channels data already inserted for {publisher.url}"
-                                    )
-
-                    logger.info("Publisher data inserted successfully")
-
-                except Exception as e:
-                    logger.error(f"loading json data failed with {e}")
+    try:
+        with open(config.output_path / config.global_sources_file, "rb") as f:
+            sources = f.read()
+        sources_hash = hashlib.sha256(sources).hexdigest()
+
+        sync_state = StateStore("publisher_sync").load()
+        if sync_state.get(str(config.global_sources_file)).get("hash") == sources_hash:
+            logger.info("Publisher data is up to date")
+            return
+
+        logger.info("Syncing publisher data")
+        with session_scope() as session:
+            stats = sync_publishers(session, orjson.loads(sources))
+        get_feed_map.cache_clear()
+        logger.info(f"Publisher data synced: {dict(stats)}")
+
+        sync_state.update(str(config.global_sources_file), hash=sources_hash)
+        sync_state.save()
     except Exception as e:
-        logger.error(f"Error Connecting to database: {e}")
+        logger.error(f"Syncing publisher data failed with {e}")
 
 
 def get_publisher_with_locale(publisher_url, locale):
@@ -196,59 +65,33 @@ def get_publisher_with_locale(publisher_url, locale):
     Get a publisher from the database
     """
     try:
-        with config.get_db_session() as session:
-            data = []
-            publisher = (
-                session.query(PublisherEntity).filter_by(url=publisher_url).first()
-            )
-            locale = session.query(LocaleEntity).filter_by(locale=locale).first()
-            if publisher:
-                publisher_data = {
-                    "enabled": publisher.enabled,
+        data = []
+        for feed in get_feed_map(locale).publisher_feeds.get(publisher_url, ()):
+            publisher = feed.publisher
+            data.append(
+                {
+                    "enabled": feed.enabled,
                     "publisher_name": publisher.name,
                     "site_url": publisher.url,
-                    "feed_url": "",
-                    "category": "",
+                    "feed_url": feed.url,
+                    "category": feed.category,
                     "favicon_url": publisher.favicon_url,
                     "cover_url": publisher.cover_url,
                     "background_color": publisher.background_color,
                     "score": publisher.score,
-                    "publisher_id": "",
-                    "locales": [],
-                }
-
-                feeds = (
-                    session.query(FeedEntity).filter_by(publisher_id=publisher.id).all()
-                )
-                for feed in feeds:
-                    feed_publisher_data = deepcopy(publisher_data)
-                    feed_publisher_data["feed_url"] = feed.url
-                    feed_publisher_data["category"] = feed.category
-                    feed_publisher_data["enabled"] = feed.enabled
-                    feed_publisher_data["publisher_id"] = feed.url_hash
-
-                    feed_locales = (
-                        session.query(FeedLocaleEntity)
-                        .filter_by(feed_id=feed.id, locale_id=locale.id)
-                        .all()
-                    )
-                    for feed_locale in feed_locales:
-                        channels = (
-                            session.query(ChannelEntity)
-                            .join(feed_locale_channel)
-                            .filter_by(feed_locale_id=feed_locale.id)
-                            .all()
-                        )
-                        locale_data = {
-                            "locale": locale.locale,
-                            "channels": [channel.name for channel in channels],
+                    "publisher_id": feed.url_hash,
+                    "locales": [
+                        {
+                            "locale": feed_locale.locale,
+                            "channels": list(feed_locale.channels),
                             "rank": feed_locale.rank,
                         }
-                        feed_publisher_data["locales"].append(locale_data)
-
-                    data.append(feed_publisher_data)
+                        for feed_locale in feed.locales
+                    ],
+                }
+            )
 
-            return data
+        return data
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
         return []
@@ -257,275 +100,282 @@ def get_publisher_with_locale(publisher_url, locale):
 def get_feeds_based_on_locale(locale):
     data = {}
     try:
-        with config.get_db_session() as session:
-            feeds = (
-                session.query(FeedEntity)
-                .filter(
-                    FeedEntity.locales.any(FeedLocaleEntity.locale.has(locale=locale))
-                )
-                .all()
-            )
-            locale = session.query(LocaleEntity).filter_by(locale=locale).first()
-
-            for feed in feeds:
-                channels = []
-                feed_locales = (
-                    session.query(FeedLocaleEntity)
-                    .filter_by(feed_id=feed.id, locale_id=locale.id)
-                    .all()
-                )
-                for feed_locale in feed_locales:
-                    channels.extend(
-                        session.query(ChannelEntity)
-                        .join(feed_locale_channel)
-                        .filter_by(feed_locale_id=feed_locale.id)
-                        .all()
-                    )
+        for feed in get_feed_map(locale).get_locale_feeds():
+            data[feed.url] = {
+                "publisher_name": feed.publisher.name,
+                "category": feed.category,
+                "site_url": feed.publisher.url,
+                "feed_url": feed.url,
+                "og_images": feed.og_images,
+                "max_entries": feed.max_entries,
+                "creative_instance_id": "",
+                "content_type": "article",
+                "publisher_id": feed.url_hash,
+                "channels": list(feed.get_channels()),
+            }
 
-                data[feed.url] = {
-                    "publisher_name": feed.publisher.name,
-                    "category": feed.category,
-                    "site_url": feed.publisher.url,
-                    "feed_url": feed.url,
-                    "og_images": feed.og_images,
-                    "max_entries": feed.max_entries,
-                    "creative_instance_id": "",
-                    "content_type": "article",
-                    "publisher_id": feed.url_hash,
-                    "channels": [channel.name for channel in set(channels)],
-                }
-
-            return data
+        return data
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
         return data
 
 
-def insert_cache_record(article_id, locale):
+def get_article_data(article, feed, channels):
+    """
+    Get the data of a stored article, as the aggregation outputs it
+    """
+    return {
+        "title": article.title,
+        "publish_time": article.publish_time.astimezone(pytz.utc).strftime(
+            "%Y-%m-%d %H:%M:%S"
+        ),
+        "img": article.img,
+        "category": article.category,
+        "description": article.description,
+        "content_type": article.content_type,
+        "publisher_id": feed.url_hash,
+        "publisher_name": feed.publisher.name,
+        "channels": list(channels),
+        "creative_instance_id": article.creative_instance_id,
+        "url": article.url,
+        "url_hash": article.url_hash,
+        "pop_score": article.pop_score,
+        "padded_img": article.padded_img,
+        "score": article.score,
+    }
+
+
+def get_mapped_article_data(article, feed_map):
+    """
+    Get the data of a stored article, with its feed and channels from the feed map. A feed
+    added since the map was loaded is read from the database instead, without channels.
+    """
+    feed = feed_map.feeds.get(article.feed_id)
+    if feed is None:
+        return get_article_data(article, article.feed, ())
+    return get_article_data(article, feed, feed.get_channels())
+
+
+def get_article(url_hash, title, locale):
     try:
-        with config.get_db_session() as session:
-            locale = session.query(LocaleEntity).filter_by(locale=locale).first()
-            db_article_cache_record = (
+        with get_session() as session:
+            article = (
+                session.query(ArticleEntity)
+                .filter_by(url_hash=get_article_hash(url_hash, title))
+                .first()
+            )
+            if not article or not article.img:
+                return None
+
+            feed_map = get_feed_map(locale)
+            article_data = get_mapped_article_data(article, feed_map)
+
+            article_cache_record = (
                 session.query(ArticleCacheRecordEntity)
-                .filter_by(article_id=article_id, locale_id=locale.id)
+                .filter_by(article_id=article.id, locale_id=feed_map.locale_id)
                 .first()
             )
-            if not db_article_cache_record:
-                article_cache_record = ArticleCacheRecordEntity(
-                    article_id=article_id, locale_id=locale.id
-                )
-                session.add(article_cache_record)
+            if article_cache_record:
+                article_cache_record.cache_hit += 1
                 session.commit()
 
+            return article_data
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
+        return None
 
 
-def insert_article(article, locale_name):
-    try:
-        with config.get_db_session() as db_session:
-            try:
-                feed = (
-                    db_session.query(FeedEntity)
-                    .filter(FeedEntity.url_hash == article.get("publisher_id"))
-                    .first()
-                )
-                article_hash = (
-                    article.get("url_hash")
-                    + hashlib.sha256(
-                        article.get("title").strip().encode("utf-8")
-                    ).hexdigest()
-                )
-                db_article = (
-                    db_session.query(ArticleEntity)
-                    .filter_by(url_hash=article_hash)
-                    .first()
-                )
-                if db_article:
-                    insert_cache_record(db_article.id, locale_name)
-                else:
-                    new_article = ArticleEntity(
-                        title=article.get("title"),
-                        publish_time=article.get("publish_time"),
-                        img=article.get("img"),
-                        category=article.get("category"),
-                        description=article.get("description"),
-                        content_type=article.get("content_type"),
-                        creative_instance_id=article.get("creative_instance_id"),
-                        url=article.get("url"),
-                        url_hash=article_hash,
-                        pop_score=article.get("pop_score"),
-                        padded_img=article.get("padded_img"),
-                        score=article.get("score"),
-                        feed_id=feed.id,
-                    )
-                    db_session.add(new_article)
-                    db_session.commit()
-                    db_session.refresh(new_article)
+def get_article_hash(url_hash, title):
+    """
+    Get the hash an article is stored under, from its URL hash and its title
+    """
+    return url_hash + hashlib.sha256(title.strip().encode("utf-8")).hexdigest()
 
-                    insert_cache_record(new_article.id, locale_name)
 
-                logger.info(f"Saved article {article.get('title')} to database")
-            except Exception as e:
-                logger.error(f"Error saving articles to database: {e}")
+def get_recent_articles(locale_name, since) -> Dict[str, Tuple[int, dict]]:
+    """
+    Get the articles with an image of the feeds of a locale published since the given time,
+    by article hash, as their ID and the data get_article returns
+    """
+    try:
+        feed_map = get_feed_map(locale_name)
+        locale_feeds = {feed.id: feed for feed in feed_map.get_locale_feeds()}
+        if not locale_feeds:
+            return {}
+
+        with get_session() as session:
+            articles = session.query(ArticleEntity).filter(
+                ArticleEntity.feed_id.in_(list(locale_feeds)),
+                ArticleEntity.publish_time >= since,
+                ArticleEntity.img != "",
+            )
+
+            return {
+                article.url_hash: (
+                    article.id,
+                    get_article_data(
+                        article,
+                        locale_feeds[article.feed_id],
+                        locale_feeds[article.feed_id].get_channels(),
+                    ),
+                )
+                for article in articles
+            }
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
+        return {}
 
 
-def get_article(url_hash, title, locale):
+def increment_cache_hits(cache_hits: Dict[int, int], locale_name) -> bool:
+    """
+    Add the cache hits of articles, by article ID, to their cache record for the locale.
+    Returns whether they were saved.
+    """
     try:
-        with config.get_db_session() as session:
-            article_hash = (
-                url_hash + hashlib.sha256(title.strip().encode("utf-8")).hexdigest()
-            )
-            article = (
-                session.query(ArticleEntity).filter_by(url_hash=article_hash).first()
-            )
-            if article:
-                channels = []
-                locale = session.query(LocaleEntity).filter_by(locale=locale).first()
-                feed_locales = (
-                    session.query(FeedLocaleEntity)
-                    .filter_by(feed_id=article.feed.id, locale_id=locale.id)
-                    .all()
+        with get_session() as session:
+            locale = session.query(LocaleEntity).filter_by(locale=locale_name).first()
+            hits_and_ids = sorted((hits, id) for id, hits in cache_hits.items())
+            for hits, group in groupby(hits_and_ids, key=lambda item: item[0]):
+                session.query(ArticleCacheRecordEntity).filter(
+                    ArticleCacheRecordEntity.article_id.in_([id for _, id in group]),
+                    ArticleCacheRecordEntity.locale_id == locale.id,
+                ).update(
+                    {"cache_hit": ArticleCacheRecordEntity.cache_hit + hits},
+                    synchronize_session=False,
                 )
-                for feed_locale in feed_locales:
-                    channels.extend(
-                        session.query(ChannelEntity)
-                        .join(feed_locale_channel)
-                        .filter_by(feed_locale_id=feed_locale.id)
-                        .all()
-                    )
-
-                if article.img:
-                    article_data = {
-                        "title": article.title,
-                        "publish_time": article.publish_time.astimezone(
-                            pytz.utc
-                        ).strftime("%Y-%m-%d %H:%M:%S"),
-                        "img": article.img,
-                        "category": article.category,
-                        "description": article.description,
-                        "content_type": article.content_type,
-                        "publisher_id": article.feed.url_hash,
-                        "publisher_name": article.feed.publisher.name,
-                        "channels": [channel.name for channel in set(channels)],
-                        "creative_instance_id": article.creative_instance_id,
-                        "url": article.url,
-                        "url_hash": article.url_hash,
-                        "pop_score": article.pop_score,
-                        "padded_img": article.padded_img,
-                        "score": article.score,
-                    }
-
-                    article_cache_record = (
-                        session.query(ArticleCacheRecordEntity)
-                        .filter_by(article_id=article.id)
-                        .filter(ArticleCacheRecordEntity.locale_id.in_([locale.id]))
-                        .first()
-                    )
-                    if article_cache_record:
-                        article_cache_record.cache_hit += 1
-                        session.commit()
-                        session.refresh(article_cache_record)
-
-                    return article_data
-                else:
-                    return None
-            else:
-                return None
+            session.commit()
+        return True
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
-        return None
+        return False
 
 
-def update_or_insert_article(article_data, locale):
+def get_article_row(article, article_hash, feed_id):
+    """
+    Get the row of the article table of an article
+    """
+    return {
+        "title": article.get("title"),
+        "publish_time": article.get("publish_time"),
+        "img": article.get("img") or "",
+        "category": article.get("category"),
+        "description": article.get("description"),
+        "content_type": article.get("content_type"),
+        "creative_instance_id": article.get("creative_instance_id"),
+        "url": article.get("url"),
+        "url_hash": article_hash,
+        "pop_score": article.get("pop_score"),
+        "padded_img": article.get("padded_img") or "",
+        "score": article.get("score", 0),
+        "feed_id": feed_id,
+    }
+
+
+def upsert_articles(articles: List[dict], locale_name) -> bool:
+    """
+    Insert or update the scored articles of a locale, and their cache records, in batches of
+    config.db_batch_size rows within a single transaction. Returns whether it was committed.
+
+    Existing articles get the title, publish time, description and scores of the new data,
+    and its image if it has one.
+    """
     try:
-        with config.get_db_session() as session:
-            article_hash = (
-                article_data.get("url_hash")
-                + hashlib.sha256(
-                    article_data.get("title").strip().encode("utf-8")
-                ).hexdigest()
-            )
-            article = (
-                session.query(ArticleEntity).filter_by(url_hash=article_hash).first()
+        with session_scope() as session:
+            locale = session.query(LocaleEntity).filter_by(locale=locale_name).first()
+            feed_ids = dict(
+                session.query(FeedEntity.url_hash, FeedEntity.id).filter(
+                    FeedEntity.url_hash.in_(
+                        {article.get("publisher_id") for article in articles}
+                    )
+                )
             )
-            if article:
-                setattr(article, "title", article_data.get("title"))
-                setattr(article, "publish_time", article_data.get("publish_time"))
-                setattr(article, "description", article_data.get("description"))
-                setattr(article, "pop_score", article_data.get("pop_score"))
-                setattr(article, "score", article_data.get("score", 0))
-
-                if article_data.get("img"):
-                    setattr(article, "img", article_data.get("img"))
-                    setattr(article, "padded_img", article_data.get("padded_img"))
 
-                session.commit()
-                session.refresh(article)
+            # a statement can't update the same row twice
+            rows = {}
+            for article in articles:
+                feed_id = feed_ids.get(article.get("publisher_id"))
+                if feed_id is None:
+                    logger.error(f"No feed found for article {article.get('url')}")
+                    continue
+                article_hash = get_article_hash(
+                    article.get("url_hash"), article.get("title")
+                )
+                rows[article_hash] = get_article_row(article, article_hash, feed_id)
+            rows = list(rows.values())
 
-            else:
-                insert_article(article_data, locale)
+            for i in range(0, len(rows), config.db_batch_size):
+                statement = pg_insert(ArticleEntity).values(
+                    rows[i : i + config.db_batch_size]
+                )
+                has_img = statement.excluded.img != ""
+                statement = statement.on_conflict_do_update(
+                    index_elements=[ArticleEntity.url_hash],
+                    set_={
+                        "title": statement.excluded.title,
+                        "publish_time": statement.excluded.publish_time,
+                        "description": statement.excluded.description,
+                        "pop_score": statement.excluded.pop_score,
+                        "score": statement.excluded.score,
+                        "img": case(
+                            (has_img, statement.excluded.img), else_=ArticleEntity.img
+                        ),
+                        "padded_img": case(
+                            (has_img, statement.excluded.padded_img),
+                            else_=ArticleEntity.padded_img,
+                        ),
+                        "modified": func.now(),
+                    },
+                ).returning(ArticleEntity.id)
+                article_ids = session.execute(statement).scalars().all()
+
+                if locale and article_ids:
+                    session.execute(
+                        pg_insert(ArticleCacheRecordEntity)
+                        .values(
+                            [
+                                {"article_id": article_id, "locale_id": locale.id}
+                                for article_id in article_ids
+                            ]
+                        )
+                        .on_conflict_do_nothing(
+                            index_elements=[
+                                ArticleCacheRecordEntity.article_id,
+                                ArticleCacheRecordEntity.locale_id,
+                            ]
+                        )
+                    )
 
+            logger.info(f"Saved {len(rows)} articles of {locale_name} to database")
+        return True
     except Exception as e:
-        logger.error(f"Error Connecting to database: {e}")
-        return None
+        logger.error(f"Error saving articles to database: {e}")
+        return False
 
 
 def get_remaining_articles(feed_url_hashes):
     try:
-        articles = []
-        with config.get_db_session() as session:
+        feed_map = get_feed_map()
+        with get_session() as session:
             remaining_articles = (
                 session.query(ArticleEntity)
                 .join(FeedEntity)
                 .filter(~FeedEntity.url_hash.in_(feed_url_hashes))
-                .all()
             )
-            for article in remaining_articles:
-                channels = []
-                feed_locales = (
-                    session.query(FeedLocaleEntity)
-                    .filter_by(feed_id=article.feed.id)
-                    .all()
-                )
-                for feed_locale in feed_locales:
-                    channels.extend(
-                        session.query(ChannelEntity)
-                        .join(feed_locale_channel)
-                        .filter_by(feed_locale_id=feed_locale.id)
-                        .all()
-                    )
-                article_data = {
-                    "title": article.title,
-                    "publish_time": article.publish_time.astimezone(pytz.utc).strftime(
-                        "%Y-%m-%d %H:%M:%S"
-                    ),
-                    "img": article.img,
-                    "category": article.category,
-                    "description": article.description,
-                    "content_type": article.content_type,
-                    "publisher_id": article.feed.url_hash,
-                    "publisher_name": article.feed.publisher.name,
-                    "channels": [channel.name for channel in set(channels)],
-                    "creative_instance_id": article.creative_instance_id,
-                    "url": article.url,
-                    "url_hash": article.url_hash,
-                    "pop_score": article.pop_score,
-                    "padded_img": article.padded_img,
-                    "score": article.score,
-                }
-                articles.append(article_data)
-            return articles
+            return [
+                get_mapped_article_data(article, feed_map)
+                for article in remaining_articles
+            ]
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
         return []
 
 
 def insert_feed_lastbuild(url_hash, last_build_time):
+    """
+    Record the last build time of a feed, along with the seconds since its previous build.
+    """
     try:
-        with config.get_db_session() as session:
+        with get_session() as session:
             feed = (
                 session.query(FeedEntity)
                 .filter(FeedEntity.url_hash == url_hash)
@@ -534,158 +384,232 @@ def insert_feed_lastbuild(url_hash, last_build_time):
             if feed:
                 last_record = (
                     session.query(FeedUpdateRecordEntity)
-                    .filter(feed_id=feed.id)
-                    .order_by(last_build_time.desc())
+                    .filter_by(feed_id=feed.id)
                     .first()
                 )
                 if last_record:
                     if last_build_time > last_record.last_build_time:
-                        last_build_timedelta = datetime.utcnow() - last_build_time
+                        last_build_timedelta = (
+                            last_build_time - last_record.last_build_time
+                        )
                         last_record.last_build_time = last_build_time
                         last_record.last_build_timedelta = (
                             last_build_timedelta.total_seconds()
                         )
                         session.commit()
-                        print("Feed update record updated successfully.")
+                        logger.debug(f"Feed update record updated for {url_hash}")
                         return True
                     else:
-                        print(
-                            "New last_build_time is not greater than the previously inserted one."
-                        )
                         return False
                 else:
                     last_build_timedelta = datetime.utcnow() - last_build_time
                     new_record = FeedUpdateRecordEntity(
                         feed_id=feed.id,
                         last_build_time=last_build_time,
-                        last_build_timedelta=last_build_timedelta.total_seconds(),
+                        last_build_timedelta=max(
+                            last_build_timedelta.total_seconds(), 0
+                        ),
                     )
                     session.add(new_record)
                     session.commit()
-                    print("Feed update record inserted successfully.")
+                    logger.debug(f"Feed update record inserted for {url_hash}")
                     return True
             else:
-                print("Feed with URL hash {} not found.".format(url_hash))
+                logger.info(f"Feed with URL hash {url_hash} not found.")
                 return False
 
     except Exception as e:
         logger.error(f"Error saving feed last build to database: {e}")
 
 
-def get_locale_average_cache_hits(locale_name):
+def get_feed_update_records(url_hashes):
+    """
+    Get the last build time and the seconds between the last two builds of the given feeds,
+    by feed url_hash.
+    """
     try:
-        one_day_ago = datetime.combine(datetime.utcnow(), time.min)
-        with config.get_db_session() as session:
-            locale = session.query(LocaleEntity).filter_by(locale=locale_name).first()
-            feeds = (
-                session.query(FeedEntity)
-                .filter(
-                    FeedEntity.locales.any(
-                        FeedLocaleEntity.locale.has(locale=locale_name)
-                    )
+        with get_session() as session:
+            records = (
+                session.query(
+                    FeedEntity.url_hash,
+                    FeedUpdateRecordEntity.last_build_time,
+                    FeedUpdateRecordEntity.last_build_timedelta,
                 )
-                .all()
-            )
-
-            feed_articles = (
-                session.query(ArticleEntity)
-                .filter(
-                    ArticleEntity.created >= one_day_ago.strftime("%Y-%m-%d %H:%M:%S"),
-                    ArticleEntity.feed_id.in_([feed.id for feed in feeds]),
+                .join(
+                    FeedUpdateRecordEntity,
+                    FeedUpdateRecordEntity.feed_id == FeedEntity.id,
                 )
+                .filter(FeedEntity.url_hash.in_(url_hashes))
                 .all()
             )
 
-            cache_hits = (
-                session.query(func.count(ArticleCacheRecordEntity.cache_hit))
-                .filter(
-                    ArticleCacheRecordEntity.article_id.in_(
-                        [article.id for article in feed_articles]
+            return {
+                record.url_hash: {
+                    "last_build_time": record.last_build_time,
+                    "last_build_timedelta": record.last_build_timedelta,
+                }
+                for record in records
+            }
+    except Exception as e:
+        logger.error(f"Error Connecting to database: {e}")
+        return {}
+
+
+def get_cache_hit_rate(articles, cached_articles):
+    return (cached_articles / articles) * 100 if articles else 0.0
+
+
+def get_cache_hit_stats(
+    since, until=None, by_feed=False, locale_name=None
+) -> List[Dict[str, Any]]:
+    """
+    Get the articles created within a window, those of them with a cache record and their
+    cache hits, per locale, or per locale and feed, in a single aggregate query
+    """
+    try:
+        with get_session() as session:
+            # a feed counts once per locale, whatever its ranks
+            feed_locales = (
+                session.query(FeedLocaleEntity.feed_id, FeedLocaleEntity.locale_id)
+                .distinct()
+                .subquery()
+            )
+            groups = [LocaleEntity.locale]
+            if by_feed:
+                groups.extend([FeedEntity.url_hash, FeedEntity.url])
+
+            query = (
+                session.query(
+                    *groups,
+                    func.count(ArticleEntity.id),
+                    func.count(ArticleCacheRecordEntity.id),
+                    func.coalesce(func.sum(ArticleCacheRecordEntity.cache_hit), 0),
+                )
+                .select_from(ArticleEntity)
+                .join(feed_locales, feed_locales.c.feed_id == ArticleEntity.feed_id)
+                .join(LocaleEntity, LocaleEntity.id == feed_locales.c.locale_id)
+                .outerjoin(
+                    ArticleCacheRecordEntity,
+                    and_(
+                        ArticleCacheRecordEntity.article_id == ArticleEntity.id,
+                        ArticleCacheRecordEntity.locale_id == LocaleEntity.id,
                     ),
-                    ArticleCacheRecordEntity.locale_id.in_([locale.id]),
                 )
-                .first()
+                .filter(ArticleEntity.created >= since)
+                .group_by(*groups)
+                .order_by(*groups)
             )
+            if by_feed:
+                query = query.join(FeedEntity, FeedEntity.id == ArticleEntity.feed_id)
+            if until:
+                query = query.filter(ArticleEntity.created < until)
+            if locale_name:
+                query = query.filter(LocaleEntity.locale == locale_name)
+
+            stats = []
+            for *group, articles, cached_articles, cache_hits in query:
+                row = dict(zip(("locale", "publisher_id", "feed_url"), group))
+                row.update(
+                    articles=articles,
+                    cached_articles=cached_articles,
+                    cache_hits=cache_hits,
+                    cache_hit_rate=get_cache_hit_rate(articles, cached_articles),
+                    average_cache_hits=cache_hits / articles,
+                )
+                stats.append(row)
+            return stats
+    except Exception as e:
+        logger.error(f"Error Connecting to database: {e}")
+        return []
 
-            cache_hits = cache_hits[0] if cache_hits[0] else 0
-            total_articles = len(feed_articles)
-
-            logger.info(f"Total articles: {total_articles}")
-            logger.info(f"Cache hits: {cache_hits}")
-
-            cache_hit_percentage = (cache_hits / total_articles) * 100
 
-            logger.info(f"Average cache hits: {cache_hit_percentage}")
+def get_locale_average_cache_hits(locale_name, since=None):
+    """
+    Get the percentage of the articles of a locale created since midnight, or since the given
+    time, which have a cache record for the locale
+    """
+    since = since or datetime.combine(datetime.utcnow(), time.min)
+    stats = get_cache_hit_stats(since, locale_name=locale_name)
+    articles = sum(row["articles"] for row in stats)
+    cached_articles = sum(row["cached_articles"] for row in stats)
 
-            return cache_hit_percentage
+    logger.info(f"Total articles: {articles}")
+    logger.info(f"Cache hits: {cached_articles}")
+    cache_hit_percentage = get_cache_hit_rate(articles, cached_articles)
+    logger.info(f"Average cache hits: {cache_hit_percentage}")
 
-    except Exception as e:
-        logger.error(f"Error Connecting to database: {e}")
+    return cache_hit_percentage
 
 
-def get_global_average_cache_hits():
+def get_global_average_cache_hits(since=None):
+    """
+    Get the number of cache records per article created since midnight, or since the given
+    time, as a percentage
+    """
     try:
-        one_day_ago = datetime.combine(datetime.utcnow(), time.min)
-        with config.get_db_session() as session:
-            articles = (
-                session.query(ArticleEntity)
-                .filter(
-                    ArticleEntity.created >= one_day_ago.strftime("%Y-%m-%d %H:%M:%S")
+        since = since or datetime.combine(datetime.utcnow(), time.min)
+        with get_session() as session:
+            articles, cached_articles = (
+                session.query(
+                    func.count(distinct(ArticleEntity.id)),
+                    func.count(ArticleCacheRecordEntity.id),
                 )
-                .all()
-            )
-
-            cache_hits = (
-                session.query(func.count(ArticleCacheRecordEntity.cache_hit))
-                .filter(
-                    ArticleCacheRecordEntity.article_id.in_(
-                        [article.id for article in articles]
-                    )
+                .select_from(ArticleEntity)
+                .outerjoin(
+                    ArticleCacheRecordEntity,
+                    ArticleCacheRecordEntity.article_id == ArticleEntity.id,
                 )
-                .first()
+                .filter(ArticleEntity.created >= since)
+                .one()
             )
 
-            cache_hits = cache_hits[0] if cache_hits[0] else 0
-            total_articles = len(articles)
-
-            logger.info(f"Total articles: {total_articles}")
-            logger.info(f"Cache hits: {cache_hits}")
-
-            cache_hit_percentage = (cache_hits / total_articles) * 100
-
+            logger.info(f"Total articles: {articles}")
+            logger.info(f"Cache hits: {cached_articles}")
+            cache_hit_percentage = get_cache_hit_rate(articles, cached_articles)
             logger.info(f"Average cache hits: {cache_hit_percentage}")
 
             return cache_hit_percentage
-
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
 
 
-def insert_external_channels(url_hash, title, external_channels, raw_data):
+def insert_all_external_channels(records: List[Tuple[str, str, list, list]]) -> bool:
+    """
+    Insert the external channels of articles, as (url_hash, title, external_channels,
+    raw_data) records, looking up the articles in a single query. Returns whether they were
+    saved.
+    """
     try:
-        with config.get_db_session() as session:
-            article_hash = (
-                url_hash + hashlib.sha256(title.strip().encode("utf-8")).hexdigest()
-            )
-            article = (
-                session.query(ArticleEntity).filter_by(url_hash=article_hash).first()
+        with session_scope() as session:
+            records = [
+                (get_article_hash(url_hash, title), external_channels, raw_data)
+                for url_hash, title, external_channels, raw_data in records
+            ]
+            article_ids = dict(
+                session.query(ArticleEntity.url_hash, ArticleEntity.id).filter(
+                    ArticleEntity.url_hash.in_(
+                        {article_hash for article_hash, _, _ in records}
+                    )
+                )
             )
-            if article:
-                new_external_channel = ExternalArticleClassificationEntity(
-                    article_id=article.id,
+            session.add_all(
+                ExternalArticleClassificationEntity(
+                    article_id=article_ids[article_hash],
                     channels=external_channels,
                     raw_data=json.dumps([{i.name: i.confidence} for i in raw_data]),
                 )
-                session.add(new_external_channel)
-                session.commit()
-                session.refresh(new_external_channel)
+                for article_hash, external_channels, raw_data in records
+                if article_hash in article_ids
+            )
+        return True
     except Exception as e:
         logger.error(f"Error Connecting to database: {e}")
+        return False
 
 
 def get_article_with_external_channels(url_hash, title, locale):
     try:
-        with config.get_db_session() as session:
+        with get_session() as session:
             article_hash = (
                 url_hash + hashlib.sha256(title.strip().encode("utf-8")).hexdigest()
             )
@@ -710,7 +634,7 @@ def get_article_with_external_channels(url_hash, title, locale):
 
 def get_channels():
     try:
-        with config.get_db_session() as session:
+        with get_session() as session:
             channels = session.query(ChannelEntity.name).distinct().all()
 
             return sorted([channel.name for channel in channels])
@@ -0,0 +1,124 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import Histogram
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from config import get_config
+
+config = get_config()
+
+DB_POOL_CHECKOUT_WAIT_METRIC = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection of the database pool",
+)
+
+_lock = threading.Lock()
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_sessionmaker: Optional[sessionmaker] = None
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A connection pool which records the time spent waiting for its connections, including
+    the time to open one when none is available.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait = 0.0
+        self.max_checkout_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            DB_POOL_CHECKOUT_WAIT_METRIC.observe(wait)
+            with self.stats_lock:
+                self.checkouts += 1
+                self.checkout_wait += wait
+                self.max_checkout_wait = max(self.max_checkout_wait, wait)
+
+
+def get_engine() -> Engine:
+    """
+    Returns the database engine shared by every session of the process.
+
+    The engine is created again after a fork, since its connections cannot be shared with
+    the parent process.
+    """
+    global _engine, _engine_pid, _sessionmaker
+
+    with _lock:
+        if _engine is None or _engine_pid != os.getpid():
+            if _engine is not None:
+                # leave the connections inherited from the parent process to the parent
+                _engine.dispose(close=False)
+            _engine = create_engine(
+                config.database_url,
+                poolclass=TimedQueuePool,
+                pool_size=config.db_pool_size or config.thread_pool_size,
+                max_overflow=config.db_max_overflow or config.thread_pool_size,
+                pool_pre_ping=True,
+            )
+            _engine_pid = os.getpid()
+            _sessionmaker = sessionmaker(bind=_engine)
+
+        return _engine
+
+
+def get_session() -> Session:
+    """
+    Returns a new session on the engine of the process.
+    """
+    get_engine()
+    return _sessionmaker()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Returns a session committed at the end of the block, or rolled back if the block raises.
+    """
+    session = get_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def get_pool_stats() -> Dict[str, float]:
+    """
+    Returns the number of connections checked out of the pool of the process, and the time
+    spent waiting for them.
+    """
+    if _engine is None or _engine_pid != os.getpid():
+        return {}
+
+    pool = _engine.pool
+    with pool.stats_lock:
+        return {
+            "checkouts": pool.checkouts,
+            "checkout_wait_seconds": round(pool.checkout_wait, 3),
+            "max_checkout_wait_seconds": round(pool.max_checkout_wait, 3),
+        }
@@ -13,14 +13,13 @@ from urllib.parse import urljoin
 
 import metadata_parser
 import numpy as np
-import requests
 import structlog
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 from orjson import orjson
 from PIL import Image
 
-from aggregator import image_processor_sandboxed
+from aggregator import http_client, image_processor_sandboxed
 from config import get_config
 from favicons_covers.color import (
     color_length,
@@ -51,7 +50,7 @@ CACHE_FOLDER.mkdir(parents=True, exist_ok=True)
 
 def get_soup(domain) -> Optional[BeautifulSoup]:
     try:
-        html = requests.get(
+        html = http_client.get(
             domain,
             timeout=config.request_timeout,
             headers={"User-Agent": ua.random, **config.default_headers},
@@ -74,7 +73,7 @@ def get_manifest_icon_urls(site_url: str, soup: BeautifulSoup):
     url = urljoin(site_url, manifest_link)
 
     try:
-        manifest_response = requests.get(
+        manifest_response = http_client.get(
             url,
             timeout=config.request_timeout,
             headers={"User-Agent": ua.random, **config.default_headers},
@@ -132,7 +131,7 @@ def get_icon(icon_url: str) -> Image:
 
     try:
         if not os.path.exists(filename):
-            response = requests.get(
+            response = http_client.get(
                 icon_url,
                 stream=True,
                 timeout=config.request_timeout,
@@ -339,7 +338,7 @@ def process_cover_image(item):
     try:
         domain, image_url, background_color = item
         try:
-            content = requests.get(image_url, timeout=config.request_timeout).content
+            content = http_client.get(image_url, timeout=config.request_timeout).content
             cache_fn = im_proc.cache_image(image_url, content)
         except Exception as e:
             cache_fn = None
@@ -387,6 +386,7 @@ if __name__ == "__main__":
         f.write(orjson.dumps(result))
 
     logger.info("Fetched all the Cover images!")
+    logger.info(f"HTTP connections: {http_client.get_connection_stats()}")
 
     if not config.no_upload:
         upload_file(
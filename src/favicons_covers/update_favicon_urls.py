@@ -7,14 +7,13 @@ from multiprocessing.pool import Pool, ThreadPool
 from typing import List, Tuple
 from urllib.parse import urljoin
 
-import requests
 import structlog
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
 from orjson import orjson
 from requests import HTTPError
 
-from aggregator import image_processor_sandboxed
+from aggregator import http_client, image_processor_sandboxed
 from config import get_config
 from utils import get_all_domains, upload_file, uri_validator
 
@@ -44,7 +43,7 @@ def get_favicon(domain: str) -> Tuple[str, str]:  # noqa: C901
             f"https://t2.gstatic.com/faviconV2?client=SOCIAL&"
             f"type=FAVICON&fallback_opts=TYPE,SIZE,URL&url={domain}&size=64"
         )
-        res = requests.get(
+        res = http_client.get(
             icon_url,
             timeout=REQUEST_TIMEOUT,
             headers={"User-Agent": ua.random, **config.default_headers},
@@ -63,7 +62,7 @@ def get_favicon(domain: str) -> Tuple[str, str]:  # noqa: C901
 
     if icon_url is None:
         try:
-            response = requests.get(
+            response = http_client.get(
                 domain,
                 timeout=REQUEST_TIMEOUT,
                 headers={"User-Agent": ua.random, **config.default_headers},
@@ -104,7 +103,7 @@ def process_favicons_image(item):
     try:
         domain, icon_url = item
         try:
-            content = requests.get(icon_url, timeout=config.request_timeout).content
+            content = http_client.get(icon_url, timeout=config.request_timeout).content
             cache_fn = im_proc.cache_image(icon_url, content)
         except Exception as e:
             cache_fn = None
@@ -138,6 +137,7 @@ if __name__ == "__main__":
         f.write(orjson.dumps(dict(processed_favicons)))
 
     logger.info("Fetched all the favicons!")
+    logger.info(f"HTTP connections: {http_client.get_connection_stats()}")
 
     if not config.no_upload:
         upload_file(
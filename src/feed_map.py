@@ -0,0 +1,152 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from collections import defaultdict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import contains_eager, joinedload
+
+from db.tables.feed_entity import FeedEntity
+from db.tables.feed_locales_entity import FeedLocaleEntity
+from db.tables.locales_entity import LocaleEntity
+from db_engine import get_session
+
+
+class MappedPublisher(NamedTuple):
+    id: int
+    name: str
+    url: str
+    enabled: bool
+    favicon_url: Optional[str]
+    cover_url: Optional[str]
+    background_color: Optional[str]
+    score: float
+
+
+class MappedFeedLocale(NamedTuple):
+    locale: str
+    rank: int
+    channels: Tuple[str, ...]
+
+
+class MappedFeed(NamedTuple):
+    id: int
+    url: str
+    url_hash: str
+    category: str
+    enabled: bool
+    og_images: bool
+    max_entries: int
+    publisher: MappedPublisher
+    # the locales of the feed in the map, i.e. all of them or only the one it is loaded for
+    locales: Tuple[MappedFeedLocale, ...]
+
+    def get_channels(self) -> FrozenSet[str]:
+        return frozenset(
+            channel for feed_locale in self.locales for channel in feed_locale.channels
+        )
+
+
+class FeedMap:
+    """
+    The feeds, their publisher, and their ranks and channels in a locale, or in every locale,
+    read-only and looked up without querying the database.
+
+    Every feed is in the map, including the ones without the locale, as the publishers
+    list all their feeds.
+    """
+
+    def __init__(
+        self,
+        locale: Optional[str],
+        locale_id: Optional[int],
+        feeds: Iterable[MappedFeed],
+    ):
+        self.locale = locale
+        self.locale_id = locale_id
+        self.feeds = MappingProxyType({feed.id: feed for feed in feeds})
+        publisher_feeds = defaultdict(list)
+        for feed in self.feeds.values():
+            publisher_feeds[feed.publisher.url].append(feed)
+        self.publisher_feeds = MappingProxyType(
+            {url: tuple(feeds) for url, feeds in publisher_feeds.items()}
+        )
+
+    def get_locale_feeds(self) -> List[MappedFeed]:
+        """
+        Returns the feeds which are in the locale of the map.
+        """
+        return [feed for feed in self.feeds.values() if feed.locales]
+
+
+def load_feed_map(locale: Optional[str] = None) -> FeedMap:
+    """
+    Loads the feeds of the database with their publisher, and their ranks and channels in a
+    locale, or in every locale if none is given, in two queries.
+    """
+    with get_session() as session:
+        feed_locales = (
+            session.query(FeedLocaleEntity)
+            .join(FeedLocaleEntity.locale)
+            .options(
+                contains_eager(FeedLocaleEntity.locale),
+                joinedload(FeedLocaleEntity.channels),
+            )
+        )
+        if locale:
+            feed_locales = feed_locales.filter(LocaleEntity.locale == locale)
+
+        locale_id = None
+        locales_by_feed = defaultdict(list)
+        for feed_locale in feed_locales:
+            if locale:
+                locale_id = feed_locale.locale_id
+            locales_by_feed[feed_locale.feed_id].append(
+                MappedFeedLocale(
+                    locale=feed_locale.locale.locale,
+                    rank=feed_locale.rank,
+                    channels=tuple(channel.name for channel in feed_locale.channels),
+                )
+            )
+
+        feeds = session.query(FeedEntity).options(joinedload(FeedEntity.publisher))
+        return FeedMap(
+            locale,
+            locale_id,
+            (
+                MappedFeed(
+                    id=feed.id,
+                    url=feed.url,
+                    url_hash=feed.url_hash,
+                    category=feed.category,
+                    enabled=feed.enabled,
+                    og_images=feed.og_images,
+                    max_entries=feed.max_entries,
+                    publisher=MappedPublisher(
+                        id=feed.publisher.id,
+                        name=feed.publisher.name,
+                        url=feed.publisher.url,
+                        enabled=feed.publisher.enabled,
+                        favicon_url=feed.publisher.favicon_url,
+                        cover_url=feed.publisher.cover_url,
+                        background_color=feed.publisher.background_color,
+                        score=feed.publisher.score,
+                    ),
+                    locales=tuple(locales_by_feed[feed.id]),
+                )
+                for feed in feeds
+            ),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_feed_map(locale: Optional[str] = None) -> FeedMap:
+    """
+    Returns the feed map of a locale, loaded once per process. `get_feed_map.cache_clear()`
+    drops the maps once the feeds change.
+    """
+    return load_feed_map(locale)
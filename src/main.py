@@ -1,14 +1,12 @@
 import json
 import shutil
-from functools import partial
-from multiprocessing.pool import ThreadPool
 
 import orjson
 import structlog
 
 from aggregator.aggregate import Aggregator
 from config import get_config
-from db_crud import get_channels, insert_article
+from db_crud import get_channels
 from utils import upload_file
 
 config = get_config()
@@ -51,13 +49,7 @@ if __name__ == "__main__":
             f"brave-today/{config.channel_file}",
         )
 
-    with open(config.output_feed_path / f"{config.feed_path}.json", "r") as f:
-        articles = orjson.loads(f.read())
-        locale_name = str(config.sources_file).replace("sources.", "")
-        logger.info(f"Feed has {len(articles)} items to insert.")
-        with ThreadPool(config.thread_pool_size) as pool:
-            pool.map(partial(insert_article, locale_name=locale_name), articles)
-        logger.info("Inserted articles into the database.")
+    fp.close_db_writer()
 
     with open(config.output_path / "report.json", "w") as f:
         f.write(json.dumps(fp.report))
@@ -0,0 +1,278 @@
+# Copyright (c) 2023 The Brave Authors. All rights reserved.
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at https://mozilla.org/MPL/2.0/. */
+
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+import structlog
+from sqlalchemy import delete, insert, tuple_, update
+
+from config import get_config
+from db.tables.base import feed_locale_channel
+from db.tables.channel_entity import ChannelEntity
+from db.tables.feed_entity import FeedEntity
+from db.tables.feed_locales_entity import FeedLocaleEntity
+from db.tables.locales_entity import LocaleEntity
+from db.tables.publsiher_entity import PublisherEntity
+
+config = get_config()
+logger = structlog.getLogger(__name__)
+
+# the columns of the publishers and feeds taken from the sources
+PUBLISHER_FIELDS = (
+    "name",
+    "favicon_url",
+    "cover_url",
+    "background_color",
+    "enabled",
+    "score",
+)
+FEED_FIELDS = ("url", "publisher_id", "category", "enabled")
+
+
+def batched(items: List, size: int) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def insert_rows(session, table, rows: List[dict], *keys) -> Dict:
+    """
+    Inserts rows in batches, and returns their new IDs by the values of `keys`.
+    """
+    ids = {}
+    columns = [getattr(table, key) for key in keys]
+    for batch in batched(rows, config.db_batch_size):
+        for row in session.execute(
+            insert(table).values(batch).returning(table.id, *columns)
+        ):
+            ids[row[1] if len(keys) == 1 else tuple(row[1:])] = row[0]
+    return ids
+
+
+def update_rows(session, entity, rows: List[dict]):
+    """
+    Updates rows in batches, by the primary key each row holds.
+    """
+    for batch in batched(rows, config.db_batch_size):
+        session.execute(update(entity), batch)
+
+
+def get_diff(current: Dict, wanted: Dict, fields: Tuple[str, ...]) -> Tuple[List, List]:
+    """
+    Returns the rows of `wanted` missing from `current`, and the ones whose fields differ,
+    with the ID of the current row.
+    """
+    inserts, updates = [], []
+    for key, row in wanted.items():
+        if key not in current:
+            inserts.append(row)
+        elif any(current[key][field] != row[field] for field in fields):
+            updates.append({"id": current[key]["id"], **row})
+    return inserts, updates
+
+
+def get_wanted_state(publishers: List[dict]):
+    """
+    Returns the publishers, feeds and feed locales described by the sources, by their key.
+    """
+    wanted_publishers = {}
+    wanted_feeds = {}
+    wanted_feed_locales = {}
+    for publisher in publishers:
+        # the first feed of a publisher sets its fields, as when they were inserted one by one
+        wanted_publishers.setdefault(
+            publisher["site_url"],
+            {
+                "name": publisher["publisher_name"],
+                "url": publisher["site_url"],
+                "favicon_url": publisher["favicon_url"],
+                "cover_url": publisher["cover_url"],
+                "background_color": publisher["background_color"],
+                "enabled": publisher["enabled"],
+                "score": publisher["score"],
+            },
+        )
+        wanted_feeds[publisher["publisher_id"]] = {
+            "url": publisher["feed_url"],
+            "url_hash": publisher["publisher_id"],
+            "site_url": publisher["site_url"],
+            "category": publisher["category"],
+            "enabled": publisher["enabled"],
+        }
+        for locale in publisher["locales"]:
+            wanted_feed_locales[(publisher["publisher_id"], locale["locale"])] = {
+                "rank": locale["rank"] or 0,
+                "channels": set(locale["channels"]),
+            }
+    return wanted_publishers, wanted_feeds, wanted_feed_locales
+
+
+def sync_publishers(session, publishers: List[dict]) -> Counter:  # noqa: C901
+    """
+    Brings the publishers, feeds, locales, channels and feed locales of the database in line
+    with the sources, loading them in a few queries and writing only the rows that differ.
+
+    Publishers and feeds removed from the sources are kept, as articles refer to them, but
+    their feeds are disabled and taken out of every locale.
+
+    Args:
+        session: The session of the transaction to sync in.
+        publishers (List[dict]): The feeds of sources.global.json.
+
+    Returns:
+        Counter: The number of rows inserted, updated and deleted, by table.
+    """
+    stats = Counter()
+    wanted_publishers, wanted_feeds, wanted_feed_locales = get_wanted_state(publishers)
+
+    # the locales and channels
+    locale_ids = dict(session.query(LocaleEntity.locale, LocaleEntity.id))
+    new_locales = {key[1] for key in wanted_feed_locales} - set(locale_ids)
+    locale_ids.update(
+        insert_rows(
+            session,
+            LocaleEntity,
+            [{"locale": locale, "name": locale} for locale in sorted(new_locales)],
+            "locale",
+        )
+    )
+    stats["locale_inserted"] = len(new_locales)
+
+    channel_ids = dict(session.query(ChannelEntity.name, ChannelEntity.id))
+    new_channels = {
+        channel
+        for feed_locale in wanted_feed_locales.values()
+        for channel in feed_locale["channels"]
+    } - set(channel_ids)
+    channel_ids.update(
+        insert_rows(
+            session,
+            ChannelEntity,
+            [{"name": channel} for channel in sorted(new_channels)],
+            "name",
+        )
+    )
+    stats["channel_inserted"] = len(new_channels)
+
+    # the publishers
+    current_publishers = {
+        publisher.url: {
+            "id": publisher.id,
+            **{field: getattr(publisher, field) for field in PUBLISHER_FIELDS},
+        }
+        for publisher in session.query(PublisherEntity)
+    }
+    inserts, updates = get_diff(current_publishers, wanted_publishers, PUBLISHER_FIELDS)
+    publisher_ids = {url: row["id"] for url, row in current_publishers.items()}
+    publisher_ids.update(insert_rows(session, PublisherEntity, inserts, "url"))
+    update_rows(session, PublisherEntity, updates)
+    stats["publisher_inserted"] = len(inserts)
+    stats["publisher_updated"] = len(updates)
+
+    # the feeds, disabling the ones removed from the sources
+    for feed in wanted_feeds.values():
+        feed["publisher_id"] = publisher_ids[feed.pop("site_url")]
+    current_feeds = {
+        feed.url_hash: {
+            "id": feed.id,
+            **{field: getattr(feed, field) for field in FEED_FIELDS},
+        }
+        for feed in session.query(FeedEntity)
+    }
+    inserts, updates = get_diff(current_feeds, wanted_feeds, FEED_FIELDS)
+    feed_ids = {url_hash: row["id"] for url_hash, row in current_feeds.items()}
+    feed_ids.update(
+        insert_rows(
+            session,
+            FeedEntity,
+            [{**feed, "og_images": False, "max_entries": 20} for feed in inserts],
+            "url_hash",
+        )
+    )
+    updates.extend(
+        {"id": feed["id"], "enabled": False}
+        for url_hash, feed in current_feeds.items()
+        if url_hash not in wanted_feeds and feed["enabled"]
+    )
+    update_rows(session, FeedEntity, updates)
+    stats["feed_inserted"] = len(inserts)
+    stats["feed_updated"] = len(updates)
+
+    # the feed locales, keeping a single one per feed and locale
+    wanted_ranks = {
+        (feed_ids[url_hash], locale_ids[locale]): feed_locale["rank"]
+        for (url_hash, locale), feed_locale in wanted_feed_locales.items()
+    }
+    current_feed_locales = {}
+    deleted_feed_locales = []
+    for feed_locale in session.query(FeedLocaleEntity).order_by(FeedLocaleEntity.id):
+        key = (feed_locale.feed_id, feed_locale.locale_id)
+        if key in wanted_ranks and key not in current_feed_locales:
+            current_feed_locales[key] = {"id": feed_locale.id, "rank": feed_locale.rank}
+        else:
+            deleted_feed_locales.append(feed_locale.id)
+    inserts, updates = get_diff(
+        current_feed_locales,
+        {
+            (feed_id, locale_id): {
+                "feed_id": feed_id,
+                "locale_id": locale_id,
+                "rank": rank,
+            }
+            for (feed_id, locale_id), rank in wanted_ranks.items()
+        },
+        ("rank",),
+    )
+    feed_locale_ids = {key: row["id"] for key, row in current_feed_locales.items()}
+    feed_locale_ids.update(
+        insert_rows(session, FeedLocaleEntity, inserts, "feed_id", "locale_id")
+    )
+    update_rows(session, FeedLocaleEntity, updates)
+    stats["feed_locale_inserted"] = len(inserts)
+    stats["feed_locale_updated"] = len(updates)
+
+    # the channels of the feed locales
+    wanted_links = {
+        (
+            feed_locale_ids[(feed_ids[url_hash], locale_ids[locale])],
+            channel_ids[channel],
+        )
+        for (url_hash, locale), feed_locale in wanted_feed_locales.items()
+        for channel in feed_locale["channels"]
+    }
+    current_links = set(
+        session.query(
+            feed_locale_channel.c.feed_locale_id, feed_locale_channel.c.channel_id
+        )
+    )
+    new_links = sorted(wanted_links - current_links)
+    for batch in batched(new_links, config.db_batch_size):
+        session.execute(
+            insert(feed_locale_channel).values(
+                [
+                    {"feed_locale_id": feed_locale_id, "channel_id": channel_id}
+                    for feed_locale_id, channel_id in batch
+                ]
+            )
+        )
+    stale_links = sorted(current_links - wanted_links)
+    for batch in batched(stale_links, config.db_batch_size):
+        session.execute(
+            delete(feed_locale_channel).where(
+                tuple_(
+                    feed_locale_channel.c.feed_locale_id,
+                    feed_locale_channel.c.channel_id,
+                ).in_(batch)
+            )
+        )
+    stats["feed_locale_channel_inserted"] = len(new_links)
+    stats["feed_locale_channel_deleted"] = len(stale_links)
+
+    # the feed locales removed from the sources, once their channels are gone
+    for batch in batched(deleted_feed_locales, config.db_batch_size):
+        session.execute(delete(FeedLocaleEntity).where(FeedLocaleEntity.id.in_(batch)))
+    stats["feed_locale_deleted"] = len(deleted_feed_locales)
+
+    return +stats
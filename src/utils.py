@@ -194,6 +194,36 @@ def get_cover_infos_lookup() -> Dict[Any, Any]:
         return {}
 
 
+def read_with_max_size(response, max_bytes: Optional[int]) -> bytes:
+    """
+    Reads the body of a streamed `requests` response, aborting as soon as it gets too large.
+
+    Unlike the Content-Length header, this also bounds chunked responses, and the read stops
+    before the whole body is pulled into memory.
+
+    Args:
+        response (requests.Response): A response of a request made with `stream=True`.
+        max_bytes (Optional[int]): The maximum size of the content in bytes.
+
+    Returns:
+        bytes: The content of the response.
+
+    Raises:
+        ValueError: If the content size exceeds the maximum size.
+    """
+    content_length = response.headers.get("Content-Length")
+    if max_bytes is not None and content_length and int(content_length) > max_bytes:
+        raise ValueError("Content-Length too large")
+
+    content = bytearray()
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        content += chunk
+        if max_bytes is not None and len(content) > max_bytes:
+            raise ValueError("Content too large")
+
+    return bytes(content)
+
+
 def push_metrics_to_pushgateway(metric, metric_value, label_value, registry):
     """
     Pushes the given metric value to the Pushgateway for monitoring purposes.
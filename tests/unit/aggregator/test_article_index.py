@@ -0,0 +1,41 @@
+from aggregator.article_index import ArticleIndex
+from db_crud import get_article_hash
+
+
+class TestArticleIndex:
+    # Stored articles are found by URL hash and title, and their cache hits are written
+    # at once.
+    def test_get_and_flush(self, mocker):
+        article_data = {"title": "Stored Article", "url_hash": "hash"}
+        mocker.patch(
+            "aggregator.article_index.get_recent_articles",
+            return_value={
+                get_article_hash("hash", "Stored Article"): (1, article_data)
+            },
+        )
+        mock_increment = mocker.patch("aggregator.article_index.increment_cache_hits")
+
+        article_index = ArticleIndex("en_US").load()
+
+        assert article_index.get("hash", " Stored Article ") == article_data
+        assert article_index.get("hash", "Stored Article") == article_data
+        assert article_index.get("hash", "Other Article") is None
+        assert article_index.get("other_hash", "Stored Article") is None
+        mock_increment.assert_not_called()
+
+        article_index.flush()
+        article_index.flush()
+
+        mock_increment.assert_called_once_with({1: 2}, "en_US")
+
+    # The data returned can be changed without changing the index.
+    def test_returns_copies(self, mocker):
+        mocker.patch(
+            "aggregator.article_index.get_recent_articles",
+            return_value={get_article_hash("hash", "Title"): (1, {"score": 1})},
+        )
+
+        article_index = ArticleIndex("en_US").load()
+        article_index.get("hash", "Title")["score"] = 2
+
+        assert article_index.get("hash", "Title") == {"score": 1}
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import time
+
+from aiohttp import web
+
+from aggregator.async_fetcher import fetch_feed, get_client_session, iter_fetched_feeds
+
+FEED = (
+    b"<rss version='2.0'><channel><item><title>Article 1</title></item></channel></rss>"
+)
+
+
+async def feed_handler(request):
+    if request.headers.get("If-None-Match") == '"v1"':
+        return web.Response(status=304)
+    return web.Response(body=FEED, headers={"ETag": '"v1"'})
+
+
+async def moved_handler(request):
+    raise web.HTTPMovedPermanently("/feed")
+
+
+async def found_handler(request):
+    raise web.HTTPFound("/feed")
+
+
+async def fetch(
+    path,
+    validators=None,
+    max_feed_size=10000000,
+    working_url=None,
+    scheme="http",
+    requested_paths=None,
+):
+    @web.middleware
+    async def record_path(request, handler):
+        if requested_paths is not None:
+            requested_paths.append(request.path)
+        return await handler(request)
+
+    app = web.Application(middlewares=[record_path])
+    app.router.add_get("/feed", feed_handler)
+    app.router.add_get("/moved", moved_handler)
+    app.router.add_get("/found", found_handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    if working_url:
+        working_url = working_url.replace("port", str(port))
+    try:
+        async with get_client_session() as session:
+            result = await fetch_feed(
+                session,
+                f"{scheme}://127.0.0.1:{port}{path}",
+                validators,
+                max_feed_size,
+                working_url,
+            )
+            if result:
+                result["working_url"] = result["working_url"].replace(str(port), "port")
+            return result
+    finally:
+        await runner.cleanup()
+
+
+class TestFetchFeed:
+    # Downloading a feed for the first time.
+    def test_downloads_feed(self):
+        result = asyncio.run(fetch("/feed"))
+
+        assert result["feed_cache"] == FEED
+        assert result["not_modified"] is False
+        assert result["validators"]["etag"] == '"v1"'
+
+    # The server answers 304 to the validators of the previous download.
+    def test_not_modified(self):
+        result = asyncio.run(fetch("/feed", {"etag": '"v1"'}))
+
+        assert result["feed_cache"] is None
+        assert result["not_modified"] is True
+        assert result["validators"] == {"etag": '"v1"'}
+
+    # The server ignores the validators but sends the same content again.
+    def test_not_modified_content_hash(self):
+        validators = {"etag": '"v0"', "content_hash": hashlib.sha256(FEED).hexdigest()}
+
+        result = asyncio.run(fetch("/feed", validators))
+
+        assert result["feed_cache"] is None
+        assert result["not_modified"] is True
+        assert result["validators"]["etag"] == '"v1"'
+
+    # A changed feed is downloaded along with its new validators.
+    def test_modified_feed(self):
+        result = asyncio.run(fetch("/feed", {"etag": '"v0"', "content_hash": "old"}))
+
+        assert result["not_modified"] is False
+        assert result["feed_cache"] == FEED
+        assert result["validators"]["etag"] == '"v1"'
+
+    # Feeds larger than the maximum size are dropped.
+    def test_content_too_large(self, mocker):
+        mocker.patch("aggregator.async_fetcher.push_metrics_to_pushgateway")
+
+        assert asyncio.run(fetch("/feed", max_feed_size=10)) is None
+
+    # Feeds failing over both schemes are dropped.
+    def test_invalid_url(self, mocker):
+        mocker.patch("aggregator.async_fetcher.push_metrics_to_pushgateway")
+
+        assert asyncio.run(fetch("/invalid_feed")) is None
+
+    # The target of a permanent redirect is requested directly next time.
+    def test_permanent_redirect(self):
+        result = asyncio.run(fetch("/moved"))
+
+        assert result["feed_cache"] == FEED
+        assert result["working_url"] == "http://127.0.0.1:port/feed"
+
+    # The URL that worked last time is tried first, and remembered again.
+    def test_working_url_first(self):
+        requested_paths = []
+
+        result = asyncio.run(
+            fetch(
+                "/moved",
+                working_url="http://127.0.0.1:port/feed",
+                requested_paths=requested_paths,
+            )
+        )
+
+        assert requested_paths == ["/feed"]
+        assert result["working_url"] == "http://127.0.0.1:port/feed"
+
+    # When the URL that worked last time fails, the feed URL is tried, then the feed URL
+    # over plain HTTP.
+    def test_working_url_fails(self):
+        requested_paths = []
+
+        result = asyncio.run(
+            fetch(
+                "/feed",
+                working_url="http://127.0.0.1:port/gone",
+                scheme="https",
+                requested_paths=requested_paths,
+            )
+        )
+
+        # the HTTPS request fails before reaching the plain HTTP server
+        assert requested_paths == ["/gone", "/feed"]
+        assert result["feed_cache"] == FEED
+        assert result["working_url"] == "http://127.0.0.1:port/feed"
+
+    # The target of a temporary redirect does not replace the URL that worked last time.
+    def test_temporary_redirect(self):
+        result = asyncio.run(fetch("/feed", working_url="http://127.0.0.1:port/found"))
+
+        assert result["feed_cache"] == FEED
+        assert result["working_url"] == "http://127.0.0.1:port/found"
+
+
+async def fake_fetch_feed(session, feed_url, delay):
+    await asyncio.sleep(delay)
+    return {"key": feed_url} if delay else None
+
+
+class TestIterFetchedFeeds:
+    # Feeds are yielded in the order they complete, leaving out the failed ones.
+    def test_yields_as_completed(self, mocker):
+        mocker.patch("aggregator.async_fetcher.fetch_feed", fake_fetch_feed)
+
+        results = iter_fetched_feeds(
+            {"slow": {"delay": 0.2}, "failed": {"delay": 0}, "fast": {"delay": 0.01}},
+            max_queued=3,
+        )
+
+        assert [result["key"] for result in results] == ["fast", "slow"]
+
+    # No more than max_queued feeds are downloading or waiting to be consumed at once.
+    def test_bounds_pending_feeds(self, mocker):
+        pending = []
+        max_pending = []
+
+        async def counting_fetch_feed(session, feed_url):
+            pending.append(feed_url)
+            max_pending.append(len(pending))
+            await asyncio.sleep(0.01)
+            return {"key": feed_url}
+
+        mocker.patch("aggregator.async_fetcher.fetch_feed", counting_fetch_feed)
+
+        for result in iter_fetched_feeds({str(i): {} for i in range(20)}, max_queued=3):
+            pending.remove(result["key"])
+            time.sleep(0.01)
+
+        assert not pending
+        assert max(max_pending) == 3
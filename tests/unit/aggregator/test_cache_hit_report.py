@@ -0,0 +1,51 @@
+import json
+from datetime import datetime
+
+import cache_hit_report
+
+
+class TestCacheHitReport:
+    # The window ends at --until and spans --hours when --since is not given.
+    def test_window_from_hours(self, mocker, capsys):
+        mock_stats = mocker.patch(
+            "cache_hit_report.get_cache_hit_stats",
+            return_value=[{"locale": "en_US", "cache_hit_rate": 50.0}],
+        )
+
+        cache_hit_report.main(
+            ["--until", "2024-05-02T00:00:00", "--hours", "48", "--by-feed"]
+        )
+
+        mock_stats.assert_called_once_with(
+            datetime(2024, 4, 30),
+            datetime(2024, 5, 2),
+            by_feed=True,
+            locale_name=None,
+        )
+        assert json.loads(capsys.readouterr().out)["stats"] == [
+            {"locale": "en_US", "cache_hit_rate": 50.0}
+        ]
+
+    # An explicit start and locale are passed as they are.
+    def test_explicit_window(self, mocker):
+        mock_stats = mocker.patch(
+            "cache_hit_report.get_cache_hit_stats", return_value=[]
+        )
+
+        cache_hit_report.main(
+            [
+                "--since",
+                "2024-04-01T00:00:00",
+                "--until",
+                "2024-05-01T00:00:00",
+                "--locale",
+                "ja_JP",
+            ]
+        )
+
+        mock_stats.assert_called_once_with(
+            datetime(2024, 4, 1),
+            datetime(2024, 5, 1),
+            by_feed=False,
+            locale_name="ja_JP",
+        )
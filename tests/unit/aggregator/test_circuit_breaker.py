@@ -0,0 +1,48 @@
+from aggregator.circuit_breaker import FeedCircuitBreaker
+from aggregator.state_store import StateStore
+
+FEED_URL = "https://example.com/feed"
+
+
+class TestFeedCircuitBreaker:
+    # A single failure does not skip the feed.
+    def test_closed_below_threshold(self):
+        circuit_breaker = FeedCircuitBreaker(StateStore("test_feed_state"))
+
+        circuit_breaker.record_failure(FEED_URL)
+
+        assert not circuit_breaker.is_open(FEED_URL)
+
+    # The feed is skipped for a growing number of runs, then probed.
+    def test_skip_runs_grow_with_failures(self):
+        circuit_breaker = FeedCircuitBreaker(StateStore("test_feed_state"))
+
+        for _ in range(4):
+            circuit_breaker.record_failure(FEED_URL)
+
+        assert circuit_breaker.get_report() == {
+            FEED_URL: {"failures": 4, "skip_runs": 4}
+        }
+        assert all(circuit_breaker.is_open(FEED_URL) for _ in range(4))
+        assert not circuit_breaker.is_open(FEED_URL)
+
+    # The skipped runs are capped.
+    def test_skip_runs_are_capped(self, mocker):
+        mocker.patch("aggregator.circuit_breaker.config.feed_max_skip_runs", 8)
+        circuit_breaker = FeedCircuitBreaker(StateStore("test_feed_state"))
+
+        for _ in range(20):
+            circuit_breaker.record_failure(FEED_URL)
+
+        assert circuit_breaker.get_report()[FEED_URL]["skip_runs"] == 8
+
+    # A successful download resets the feed.
+    def test_success_resets(self):
+        circuit_breaker = FeedCircuitBreaker(StateStore("test_feed_state"))
+        for _ in range(3):
+            circuit_breaker.record_failure(FEED_URL)
+
+        circuit_breaker.record_success(FEED_URL)
+
+        assert not circuit_breaker.is_open(FEED_URL)
+        assert circuit_breaker.get_report() == {}
@@ -0,0 +1,57 @@
+import dateparser
+import pytest
+
+from aggregator import dates
+from aggregator.dates import parse_date
+
+DATES = [
+    "Thu, 12 Nov 2020 08:20:20 +0000",
+    "Thu, 12 Nov 2020 08:20:20 GMT",
+    "Thu, 12 Nov 2020 8:20:20 -0000",
+    "Thu, 12 Nov 2020 08:20:20 EST",
+    "12 Nov 2020 08:20:20 +0530",
+    "Thursday, 12-Nov-20 08:20:20 UTC",
+    "Thu, 12 Nov 2020 08:20:20 CEST",
+    "Thu, 12 Nov 2020 08:20:20",
+    "2020-11-12T00:00:00Z",
+    "2020-11-12T00:00:00.123+01:00",
+    "2020-11-12T00:00:00.1234-05:00",
+    "2020-11-12 00:29:41",
+    "2020-11-12",
+    " 2020-11-12T00:00:00Z\n",
+    "12 November 2020",
+    "not a date",
+]
+
+
+class TestParseDate:
+    # The dates are the same as the ones dateparser returns.
+    @pytest.mark.parametrize("value", DATES)
+    def test_same_as_dateparser(self, value):
+        expected = dateparser.parse(value)
+
+        result = parse_date(value)
+
+        assert result == expected
+        if expected:
+            assert result.utcoffset() == expected.utcoffset()
+
+    # The formats used by most feeds don't go through dateparser.
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "Mon, 06 May 2024 10:00:00 GMT",
+            "Mon, 06 May 2024 10:00:00 -0400",
+            "2024-05-06T10:00:00Z",
+            "2024-05-06 10:00:00",
+        ],
+    )
+    def test_fast_path(self, mocker, value):
+        mock_parse = mocker.patch("dateparser.parse")
+
+        assert parse_date(value) is not None
+        mock_parse.assert_not_called()
+
+    # Time zones parsedate_tz doesn't know are left to dateparser.
+    def test_unknown_time_zone(self):
+        assert dates.parse_rfc822_date("Mon, 06 May 2024 10:00:00 CEST") is None
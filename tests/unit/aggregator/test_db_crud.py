@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from db_crud import get_mapped_article_data
+from feed_map import FeedMap, MappedFeed, MappedFeedLocale, MappedPublisher
+
+
+def get_article(feed_id):
+    return SimpleNamespace(
+        title="Title",
+        publish_time=datetime(2024, 5, 1, tzinfo=timezone.utc),
+        img="https://example.com/img.jpg",
+        category="Top News",
+        description="",
+        content_type="article",
+        creative_instance_id="",
+        url="https://example.com/article",
+        url_hash="hash",
+        pop_score=1.0,
+        padded_img="",
+        score=0.0,
+        feed_id=feed_id,
+        feed=SimpleNamespace(
+            url_hash="new_feed", publisher=SimpleNamespace(name="New Publisher")
+        ),
+    )
+
+
+class TestGetMappedArticleData:
+    # The feed and channels of an article come from the feed map.
+    def test_mapped_feed(self):
+        feed = MappedFeed(
+            id=1,
+            url="https://example.com/feed",
+            url_hash="feed",
+            category="Top News",
+            enabled=True,
+            og_images=False,
+            max_entries=20,
+            publisher=MappedPublisher(
+                1, "Example", "https://example.com", True, None, None, None, 0.0
+            ),
+            locales=(MappedFeedLocale("en_US", 1, ("Tech",)),),
+        )
+
+        data = get_mapped_article_data(get_article(1), FeedMap("en_US", 1, [feed]))
+
+        assert data["publisher_id"] == "feed"
+        assert data["channels"] == ["Tech"]
+
+    # A feed added since the map was loaded is read from the article, without channels.
+    def test_feed_not_in_map(self):
+        data = get_mapped_article_data(get_article(2), FeedMap("en_US", 1, []))
+
+        assert data["publisher_id"] == "new_feed"
+        assert data["publisher_name"] == "New Publisher"
+        assert data["channels"] == []
@@ -0,0 +1,96 @@
+from aggregator.db_writer import ARTICLE, CACHE_HITS, EXTERNAL_CHANNELS, DBWriter
+
+
+def mock_writes(mocker):
+    calls = []
+
+    def recorder(name):
+        def write(records, *args):
+            calls.append((name, records))
+            return True
+
+        return write
+
+    for name, function in (
+        ("articles", "upsert_articles"),
+        ("cache_hits", "increment_cache_hits"),
+        ("external_channels", "insert_all_external_channels"),
+    ):
+        mocker.patch(f"aggregator.db_writer.{function}", side_effect=recorder(name))
+    return calls
+
+
+class TestDBWriter:
+    # A batch is written by kind of record, the articles first, with the cache hits summed.
+    def test_write_batch(self, mocker):
+        calls = mock_writes(mocker)
+
+        DBWriter("en_US").write(
+            [
+                (EXTERNAL_CHANNELS, ("hash", "Title", ["Top News"], []), 0),
+                (CACHE_HITS, {1: 1, 2: 1}, 0),
+                (ARTICLE, {"title": "First"}, 0),
+                (CACHE_HITS, {1: 2}, 0),
+                (ARTICLE, {"title": "Second"}, 0),
+            ]
+        )
+
+        assert calls == [
+            ("articles", [{"title": "First"}, {"title": "Second"}]),
+            ("cache_hits", {1: 3, 2: 1}),
+            ("external_channels", [("hash", "Title", ["Top News"], [])]),
+        ]
+
+    # The records which could not be saved are counted as failed, not as written.
+    def test_failed_writes(self, mocker):
+        mocker.patch("db_crud.session_scope", side_effect=Exception("unreachable"))
+        mocker.patch("db_crud.get_session", side_effect=Exception("unreachable"))
+        db_writer = DBWriter("en_US")
+
+        db_writer.write(
+            [
+                (ARTICLE, {"title": "First", "url_hash": "hash"}, 0),
+                (CACHE_HITS, {1: 1}, 0),
+                (EXTERNAL_CHANNELS, ("hash", "First", ["Top News"], []), 0),
+            ]
+        )
+
+        assert db_writer.stats["failed"] == 3
+        assert db_writer.stats["written"] == 0
+        assert db_writer.max_lag == 0.0
+
+    # The records are written in the background, and all of them once the writer is closed.
+    def test_close_waits_for_writes(self, mocker):
+        calls = mock_writes(mocker)
+        db_writer = DBWriter("en_US", max_size=2)
+        db_writer.start()
+
+        db_writer.put_articles([{"title": str(i)} for i in range(10)])
+        db_writer.put_cache_hits({1: 1})
+        stats = db_writer.close()
+
+        written = [
+            article for kind, batch in calls if kind == "articles" for article in batch
+        ]
+        assert written == [{"title": str(i)} for i in range(10)]
+        assert ("cache_hits", {1: 1}) in calls
+        assert stats["queued"] == stats["written"] == 11
+        assert db_writer.thread is None
+
+    # The records queued before the writer is started are written once it is closed.
+    def test_close_starts_writer(self, mocker):
+        calls = mock_writes(mocker)
+        db_writer = DBWriter("en_US")
+
+        db_writer.put_cache_hits({1: 1})
+        assert db_writer.thread is None
+        stats = db_writer.close()
+
+        assert calls == [("cache_hits", {1: 1})]
+        assert stats["written"] == 1
+
+    # A writer which was never used has no thread to wait for.
+    def test_close_unused(self):
+        db_writer = DBWriter("en_US")
+
+        assert db_writer.close() == {"max_lag_seconds": 0.0}
@@ -1,9 +1,59 @@
-from aggregator.external_services import get_popularity_score, get_predicted_channels
+import pytest
+from requests import HTTPError
+
+from aggregator.external_services import (
+    get_popularity_score,
+    get_predicted_channels,
+    get_with_max_size,
+)
 from config import get_config
 
 config = get_config()
 
 
+def mock_response(mocker, status_code, content=b""):
+    response = mocker.MagicMock(status_code=status_code, headers={})
+    response.iter_content.return_value = [content]
+    mocker.patch("aggregator.http_client.get").return_value.__enter__.return_value = (
+        response
+    )
+    return response
+
+
+class TestGetWithMaxSize:
+    # Successfully retrieves content from a URL
+    def test_retrieves_content(self):
+        # Arrange
+        url = "http://example.com"
+
+        # Act
+        result = get_with_max_size(url)
+
+        # Assert
+        assert result is not None
+        assert isinstance(result, bytes)
+
+    # Raises HTTPError for non-200 status codes
+    def test_raises_http_error(self):
+        # Arrange
+        url = "http://example.com/nonexistent"
+
+        # Act & Assert
+        with pytest.raises(HTTPError):
+            get_with_max_size(url)
+
+    # Aborts a response without Content-Length once it exceeds the maximum size.
+    def test_streamed_content_too_large(self, mocker):
+        response = mock_response(mocker, 200)
+        response.iter_content.return_value = iter([b"a" * 6, b"a" * 6, b"a" * 6])
+
+        with pytest.raises(ValueError):
+            get_with_max_size("https://example.com/feed", max_bytes=10)
+
+        # the last chunk is never read
+        assert next(response.iter_content.return_value) == b"a" * 6
+
+
 class TestGetPopularityScore:
     # Successfully retrieves popularity score for an article.
     def test_retrieves_popularity_score(self, mocker):
@@ -52,7 +102,7 @@ class TestGetPopularityScore:
 
 class TestGetPredictedChannel:
     def test_article_default_channel_or_short_text(self, mocker):
-        mocker.patch("requests.post")
+        mocker.patch("aggregator.http_client.post")
         mocker.patch("structlog.getLogger")
 
         channels_1_default = ["Fun"]
@@ -78,7 +128,7 @@ class TestGetPredictedChannel:
 
     def test_article_api_response_no_categories(self, mocker):
         # Mock the necessary dependencies
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         mock_post.return_value.json.return_value = {"results": [{"categories": []}]}
         mocker.patch("structlog.getLogger")
@@ -97,7 +147,7 @@ class TestGetPredictedChannel:
 
     def test_article_if_predicted_category_excluded(self, mocker):
         # Mock the necessary dependencies
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         excluded_category = "Crime"
         mock_post.return_value.json.return_value = {
@@ -126,7 +176,7 @@ class TestGetPredictedChannel:
 
     def test_article_if_predicted_category_below_threshold(self, mocker):
         # Mock the necessary dependencies
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         valid_category = "Sports"
         mock_post.return_value.json.return_value = {
@@ -154,7 +204,7 @@ class TestGetPredictedChannel:
         assert valid_category not in result["channels"]
 
     def test_predict_channel(self, mocker):
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         valid_category = "Sports"
         mock_post.return_value.json.return_value = {
@@ -182,7 +232,7 @@ class TestGetPredictedChannel:
         assert result["channels"] == [valid_category]
 
     def test_predict_channel_with_augment_channel(self, mocker):
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         valid_category = "Sports"
         mock_post.return_value.json.return_value = {
@@ -218,7 +268,7 @@ class TestGetPredictedChannel:
         assert set(result_2["channels"]) == {"Top News", "Top Sources", valid_category}
 
     def test_predict_channel_with_default_channel(self, mocker):
-        mock_post = mocker.patch("requests.post")
+        mock_post = mocker.patch("aggregator.http_client.post")
         mock_post.return_value.raise_for_status.return_value = None
         valid_category = "Sports"
         mock_post.return_value.json.return_value = {
@@ -0,0 +1,120 @@
+import feedparser
+import pytest
+from lxml import etree
+
+from aggregator import fast_parser
+from aggregator.fast_parser import UnsupportedFeedError
+from aggregator.processor import process_articles
+from config import get_config
+
+config = get_config()
+
+PUBLISHER = {
+    "site_url": "https://www.nytimes.com",
+    "category": "Top News",
+    "content_type": "article",
+    "publisher_id": "id",
+    "publisher_name": "NYT",
+    "channels": ["Top News"],
+    "creative_instance_id": "",
+}
+
+RSS = b"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/"
+    xmlns:content="http://purl.org/rss/1.0/modules/content/"
+    xmlns:dc="http://purl.org/dc/elements/1.1/">
+<channel><title>Feed</title><lastBuildDate>Thu, 12 Nov 2020 08:20:20 +0000</lastBuildDate>
+<item><title>Tom &amp; Jerry &lt;b&gt;bold&lt;/b&gt;</title><guid>https://e.com/guid/1</guid>
+<dc:date>2020-11-12T00:00:00Z</dc:date>
+<media:group><media:thumbnail url="https://e.com/t.jpg" width="10"/></media:group>
+<media:content url="https://e.com/c.jpg" width="100" medium="image"/>
+<enclosure url="https://e.com/a.mp3" length="12" type="audio/mpeg"/>
+<category>Cat1</category><category>Cat2</category>
+<content:encoded><![CDATA[<p>Hi <img src="/rel.jpg"></p>]]></content:encoded>
+</item>
+<item><title><![CDATA[<b>Second</b> title]]></title><link> https://e.com/2/article </link>
+<description>desc &lt;img src="x.jpg"&gt;</description>
+<pubDate>Thu, 12 Nov 2020 00:29:41 +0000</pubDate><category>Cat</category></item>
+</channel></rss>"""
+
+ATOM = b"""<?xml version="1.0" encoding="ISO-8859-1"?>
+<feed xmlns="http://www.w3.org/2005/Atom"><title>Feed</title>
+<updated>2020-11-12T00:00:00Z</updated>
+<entry><title type="html">Caf\xe9 &amp;amp; B</title><id>x</id>
+<link rel="alternate" href="https://e.com/a1/article"/>
+<link rel="enclosure" href="https://e.com/x.mp3" type="audio/mpeg" length="5"/>
+<published>2020-11-11T00:00:00Z</published><updated>2020-11-12T00:00:00Z</updated>
+<summary>Summary</summary><content type="html">&lt;p&gt;C&lt;/p&gt;</content>
+<category term="T1"/></entry></feed>"""
+
+
+def process_feed(parsed_feed):
+    return [
+        process_articles(entry, PUBLISHER, parsed_feed["feed"])
+        for entry in parsed_feed["entries"]
+    ]
+
+
+class TestParse:
+    # The processed articles are the same as with feedparser.
+    @pytest.mark.parametrize(
+        "data",
+        [RSS, ATOM, (config.tests_data_dir / "test.rss").read_bytes()],
+    )
+    def test_same_articles_as_feedparser(self, mocker, data):
+        # keep the old entries of the test feeds
+        mocker.patch("aggregator.processor.is_within_publish_window", return_value=True)
+
+        assert process_feed(fast_parser.parse(data)) == process_feed(
+            feedparser.parse(data)
+        )
+
+    # The fields read by the aggregator are named and shaped after feedparser's.
+    def test_rss_fields(self):
+        entry = fast_parser.parse(RSS)["entries"][0]
+
+        assert entry["title"] == "Tom & Jerry <b>bold</b>"
+        assert entry["link"] == "https://e.com/guid/1"
+        assert entry["updated"] == "2020-11-12T00:00:00Z"
+        assert entry["media_content"] == [
+            {"url": "https://e.com/c.jpg", "width": "100", "medium": "image"}
+        ]
+        assert entry["media_thumbnail"] == [
+            {"url": "https://e.com/t.jpg", "width": "10"}
+        ]
+        assert entry["enclosures"] == [
+            {"href": "https://e.com/a.mp3", "length": "12", "type": "audio/mpeg"}
+        ]
+        assert entry["category"] == "Cat1"
+        assert entry["summary"] == entry["content"][0]["value"]
+
+    # The dates of the feed are parsed like feedparser does.
+    def test_feed_dates(self):
+        assert (
+            fast_parser.parse(RSS)["feed"]["updated_parsed"]
+            == feedparser.parse(RSS)["feed"]["updated_parsed"]
+        )
+
+    # Parsing stops after max_entries entries.
+    def test_max_entries(self):
+        assert len(fast_parser.parse(RSS, max_entries=1)["entries"]) == 1
+
+    # Feeds that feedparser would parse differently are left to it.
+    @pytest.mark.parametrize(
+        "data",
+        [
+            b"<!DOCTYPE rss [<!ENTITY nbsp '&#160;'>]><rss><channel/></rss>",
+            b"<rss><channel><item><description>&lt;script&gt;x()&lt;/script&gt;"
+            b"</description></item></channel></rss>",
+            b"<rdf:RDF xmlns:rdf='http://www.w3.org/1999/02/22-rdf-syntax-ns#'/>",
+            b"<rss><channel><item><title>A <b>B</b></title></item></channel></rss>",
+        ],
+    )
+    def test_unsupported_feeds(self, data):
+        with pytest.raises(UnsupportedFeedError):
+            fast_parser.parse(data)
+
+    # Malformed feeds are rejected.
+    def test_malformed_feed(self):
+        with pytest.raises(etree.XMLSyntaxError):
+            fast_parser.parse(b"<rss><channel><item><title>A &nbsp; B</title>")
@@ -0,0 +1,62 @@
+import pytest
+
+from feed_map import FeedMap, MappedFeed, MappedFeedLocale, MappedPublisher
+
+PUBLISHER = MappedPublisher(
+    id=1,
+    name="Example",
+    url="https://example.com",
+    enabled=True,
+    favicon_url=None,
+    cover_url=None,
+    background_color=None,
+    score=0.0,
+)
+
+
+def get_feed(id, locales=()):
+    return MappedFeed(
+        id=id,
+        url=f"https://example.com/feed{id}",
+        url_hash=f"hash{id}",
+        category="Top News",
+        enabled=True,
+        og_images=False,
+        max_entries=20,
+        publisher=PUBLISHER,
+        locales=tuple(locales),
+    )
+
+
+class TestFeedMap:
+    # The publishers list all their feeds, and the locale only the feeds it has.
+    def test_locale_and_publisher_feeds(self):
+        feed_in_locale = get_feed(1, [MappedFeedLocale("en_US", 1, ("Tech",))])
+        other_feed = get_feed(2)
+        feed_map = FeedMap("en_US", 10, [feed_in_locale, other_feed])
+
+        assert feed_map.get_locale_feeds() == [feed_in_locale]
+        assert feed_map.publisher_feeds["https://example.com"] == (
+            feed_in_locale,
+            other_feed,
+        )
+        assert feed_map.feeds[2] == other_feed
+
+    # The channels of a feed are the ones of all its locales in the map, once each.
+    def test_channels(self):
+        feed = get_feed(
+            1,
+            [
+                MappedFeedLocale("en_US", 1, ("Tech", "Top News")),
+                MappedFeedLocale("en_GB", 2, ("Tech",)),
+            ],
+        )
+
+        assert feed.get_channels() == {"Tech", "Top News"}
+
+    # The map can't be changed by the helpers reading it.
+    def test_read_only(self):
+        feed_map = FeedMap("en_US", 10, [get_feed(1)])
+
+        with pytest.raises(TypeError):
+            feed_map.feeds[2] = get_feed(2)
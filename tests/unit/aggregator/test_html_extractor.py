@@ -0,0 +1,60 @@
+import pytest
+from bs4 import BeautifulSoup as BS
+
+from aggregator.html_extractor import HTMLExtractor, extract_html
+
+FRAGMENTS = [
+    "Plain title",
+    "",
+    "  \n ",
+    "Tom &amp; Jerry &amp Friends &foo; &#147;quoted&#148; &#x41;",
+    "<p>First</p>\n  \n<p>Second <b>bold</b></p>",
+    "<pre>  </pre><p>  </p>",
+    "<p>Text<script>var a = '<b>';</script><style>p {}</style> after</p>",
+    "<ruby>漢<rp>(</rp><rt>kan</rt><rp>)</rp></ruby>",
+    "<template><b>hidden</b></template>shown",
+    "<!-- comment --><!DOCTYPE html><![CDATA[ data ]]>text",
+    "<p>a<br>b<br/>c</br>d",
+    "<div><p>unclosed <b>tags",
+    "<img alt='none'><img src='first.jpg'><img src='second.jpg'>",
+    "<img src><img src='second.jpg'>",
+    "<IMG SRC='UPPER.JPG' src='last.jpg'/>",
+    "1 < 2 and 3 > 2",
+]
+
+
+def get_soup_results(fragment):
+    soup = BS(fragment, features="html.parser")
+    img_src = next(
+        (img["src"] for img in soup.find_all("img") if "src" in img.attrs), ""
+    )
+    return soup.get_text(), img_src
+
+
+class TestExtractHtml:
+    # The text and the first image are the same as the ones found with BeautifulSoup.
+    @pytest.mark.parametrize("fragment", FRAGMENTS)
+    def test_same_as_beautifulsoup(self, fragment):
+        assert extract_html(fragment) == get_soup_results(fragment)
+
+    # Fragments without markup are not parsed.
+    def test_no_markup(self, mocker):
+        mock_feed = mocker.patch.object(HTMLExtractor, "feed")
+
+        assert extract_html("No markup in this title") == (
+            "No markup in this title",
+            "",
+        )
+        mock_feed.assert_not_called()
+
+    # The text and the image are found in a single pass over the fragment.
+    def test_single_pass(self, mocker):
+        spy_feed = mocker.spy(HTMLExtractor, "feed")
+
+        fragment = "<p>A picture <img src='https://example.com/image.jpg'></p>"
+        assert extract_html(fragment) == (
+            "A picture ",
+            "https://example.com/image.jpg",
+        )
+        assert extract_html(fragment)[0] == "A picture "
+        assert spy_feed.call_count == 1
@@ -0,0 +1,74 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from aggregator import http_client
+
+
+class ConsentHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/consent":
+            self.send_response(302)
+            self.send_header("Set-Cookie", "consent=yes; Path=/")
+            self.send_header("Location", "/article")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body = self.headers.get("Cookie", "").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ConsentHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestGetSession:
+    # The session is shared by all the calls of a process.
+    def test_session_is_shared(self):
+        assert http_client.get_session() is http_client.get_session()
+
+    # A forked process gets its own session.
+    def test_session_is_recreated_after_fork(self, mocker):
+        session = http_client.get_session()
+        mocker.patch("os.getpid", return_value=os.getpid() + 1)
+
+        assert http_client.get_session() is not session
+
+
+class TestCookies:
+    # The cookies set along the redirects are sent on, but not to the next calls.
+    def test_cookies_kept_within_call(self, server_url):
+        response = http_client.get(f"{server_url}/consent", timeout=5)
+
+        assert response.content == b"consent=yes"
+        assert not http_client.get_session().cookies
+        assert http_client.get(f"{server_url}/article", timeout=5).content == b""
+
+
+class TestGetConnectionStats:
+    def test_counts_reused_connections(self, mocker):
+        adapter = http_client.get_session().get_adapter("https://")
+        pool = mocker.Mock(num_connections=2, num_requests=5)
+        mocker.patch.object(adapter.poolmanager.pools, "keys", return_value=["host"])
+        mocker.patch.object(adapter.poolmanager.pools, "get", return_value=pool)
+        adapter.disposed_stats.clear()
+
+        assert http_client.get_connection_stats() == {
+            "connections_created": 2,
+            "connections_reused": 3,
+            "requests": 5,
+        }
@@ -126,18 +126,34 @@ class TestCheckImagesInItem:
 class TestGetArticleImg:
     def test_returns_image_url_from_image_key(self, mocker):
         article = {"image": "https://example.com/image.jpg"}
-        mocker.patch("src.aggregator.image_fetcher.BS")
+        mocker.patch("aggregator.image_fetcher.extract_html")
         result = get_article_img(article)
         assert result == "https://example.com/image.jpg"
 
     def test_returns_empty_string_if_image_key_is_empty(self, mocker):
         article = {"image": ""}
-        mocker.patch("src.aggregator.image_fetcher.BS")
+        mocker.patch("aggregator.image_fetcher.extract_html")
         result = get_article_img(article)
         assert result == ""
 
     def test_returns_empty_string_if_urlToImage_key_is_empty(self, mocker):
         article = {"urlToImage": ""}
-        mocker.patch("src.aggregator.image_fetcher.BS")
+        mocker.patch("aggregator.image_fetcher.extract_html")
         result = get_article_img(article)
         assert result == ""
+
+    def test_returns_first_image_of_summary(self):
+        article = {
+            "summary": "<p>Text <img alt='none'><img src='https://example.com/a.jpg'></p>",
+            "content": [{"value": "<img src='https://example.com/b.jpg'>"}],
+        }
+        result = get_article_img(article)
+        assert result == "https://example.com/a.jpg"
+
+    def test_returns_first_image_of_content_if_summary_has_none(self):
+        article = {
+            "summary": "Text only",
+            "content": [{"value": "<img src='https://example.com/b.jpg'>"}],
+        }
+        result = get_article_img(article)
+        assert result == "https://example.com/b.jpg"
@@ -1,46 +1,34 @@
-import pytest
-from requests import HTTPError
+from datetime import datetime
 
-from aggregator.parser import download_feed, get_with_max_size, parse_rss
+from aggregator.parser import get_candidate_urls, get_conditional_headers, parse_rss
 
 
-class TestGetWithMaxSize:
-    # Successfully retrieves content from a URL
-    def test_retrieves_content(self):
-        # Arrange
-        url = "http://example.com"
+class TestGetCandidateUrls:
+    def test_without_working_url(self):
+        assert get_candidate_urls("https://example.com/feed") == [
+            "https://example.com/feed",
+            "http://example.com/feed",
+        ]
 
-        # Act
-        result = get_with_max_size(url)
+    def test_with_working_url(self):
+        assert get_candidate_urls(
+            "https://example.com/feed", "http://example.com/feed"
+        ) == ["http://example.com/feed", "https://example.com/feed"]
 
-        # Assert
-        assert result is not None
-        assert isinstance(result, bytes)
-
-    # Raises HTTPError for non-200 status codes
-    def test_raises_http_error(self):
-        # Arrange
-        url = "http://example.com/nonexistent"
-
-        # Act & Assert
-        with pytest.raises(HTTPError):
-            get_with_max_size(url)
 
+class TestGetConditionalHeaders:
+    def test_headers_from_validators(self):
+        headers = get_conditional_headers(
+            {"etag": '"abc"', "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        )
 
-class TestDownloadFeed:
-    # Downloading a feed with a valid URL and default max_feed_size.
-    def test_valid_url_default_max_feed_size(self):
-        feed_url = "https://brave.com/blog/index.xml"
-        result = download_feed(feed_url)
-        assert result is not None
-        assert "feed_cache" in result
-        assert "key" in result
+        assert headers == {
+            "If-None-Match": '"abc"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+        }
 
-    # Downloading a feed with an invalid URL.
-    def test_invalid_url(self):
-        feed_url = "https://example.com/invalid_feed"
-        result = download_feed(feed_url)
-        assert result is None
+    def test_no_validators(self):
+        assert get_conditional_headers({}) == {}
 
 
 class TestParseRss:
@@ -64,3 +52,43 @@ class TestParseRss:
         }
 
         assert parse_rss(downloaded_feed) is None
+
+    # The last build time of the feed is taken from its newest entry.
+    def test_parse_rss_last_build_time(self):
+        downloaded_feed = {
+            "key": "https://example.com/rss_feed",
+            "feed_cache": "<rss version='2.0'><channel><title>Example Feed</title>"
+            "<item><title>Article 1</title><pubDate>Mon, 06 May 2024 10:00:00 GMT</pubDate></item>"
+            "<item><title>Article 2</title><pubDate>Tue, 07 May 2024 10:00:00 GMT</pubDate></item>"
+            "</channel></rss>",
+        }
+
+        result = parse_rss(downloaded_feed)
+
+        assert result["last_build_time"] == datetime(2024, 5, 7, 10, 0, 0)
+
+    # Only the fields read by process_articles are kept, up to max_entries entries.
+    def test_parse_rss_compact_feed(self):
+        downloaded_feed = {
+            "key": "https://example.com/rss_feed",
+            "feed_cache": "<rss version='2.0'><channel><title>Example Feed</title>"
+            "<pubDate>Mon, 06 May 2024 10:00:00 GMT</pubDate>"
+            "<item><title>Article 1</title><link>https://example.com/1</link>"
+            "<guid>1</guid><author>Someone</author></item>"
+            "<item><title>Article 2</title></item>"
+            "</channel></rss>",
+            "max_entries": 1,
+        }
+
+        result = parse_rss(downloaded_feed)
+
+        assert result["feed_cache"] == {
+            "feed": {"published": "Mon, 06 May 2024 10:00:00 GMT"},
+            "entries": [
+                {
+                    "title": "Article 1",
+                    "link": "https://example.com/1",
+                    "enclosures": [],
+                }
+            ],
+        }
@@ -1,9 +1,22 @@
 import hashlib
+import time
 from datetime import datetime
 
+import bleach
+import pytest
 import pytz
 
-from aggregator.processor import process_articles, scrub_html, unshorten_url
+from aggregator.processor import (
+    needs_unshortening,
+    process_articles,
+    process_feed_batch,
+    scrub_html,
+    unshorten_url,
+)
+from aggregator.state_store import StateStore
+from config import get_config
+
+config = get_config()
 
 
 class TestProcessArticles:
@@ -78,7 +91,10 @@ class TestProcessArticles:
 
     # Skip processing an article with a profanity in the title.
     def test_skip_article_with_profanity_in_title(self, mocker):
-        mocker.patch("better_profanity.profanity.contains_profanity", return_value=True)
+        mocker.patch(
+            "aggregator.processor.profanity_filter.contains_profanity",
+            return_value=True,
+        )
 
         article = {
             "title": "Example Article with profanity",
@@ -141,6 +157,24 @@ class TestUnshortenUrl:
         # Assert the URL is encoded
         assert result["url"] == "https://example.com"
 
+    # The resolved URL is published, and its canonical form hashed.
+    def test_hashes_canonical_url(self, mocker):
+        mock_unshortener = mocker.Mock()
+        mocker.patch("unshortenit.UnshortenIt", return_value=mock_unshortener)
+        mock_unshortener.unshorten.return_value = (
+            "https://WWW.Example.com/article/?utm_source=feed&id=1#top"
+        )
+
+        result, _ = unshorten_url({"link": "https://bit.ly/3i2QJgA", "title": "Title"})
+
+        assert (
+            result["url"] == "https://WWW.Example.com/article/?utm_source=feed&id=1#top"
+        )
+        assert (
+            result["url_hash"]
+            == hashlib.sha256(b"https://www.example.com/article?id=1").hexdigest()
+        )
+
     # Skips unshortening if the URL is None.
     def test_skip_unshortening_if_url_none(self, mocker):
         # Create the input article with None URL
@@ -152,6 +186,79 @@ class TestUnshortenUrl:
         # Assert the result is None
         assert result is None
 
+    # Links on the destination domains of the publisher are not resolved.
+    def test_skip_unshortening_publisher_link(self, mocker):
+        mock_unshortenit = mocker.patch("unshortenit.UnshortenIt")
+
+        out_article = {
+            "link": "https://www.example.com/article",
+            "title": "Example Article",
+            "publisher_id": "publisher",
+        }
+
+        result, _ = unshorten_url(
+            out_article, {"publisher": {"destination_domains": ["example.com"]}}
+        )
+
+        assert result["url"] == "https://www.example.com/article"
+        mock_unshortenit.assert_not_called()
+
+    # Links resolved in a previous run are not resolved again until they expire.
+    def test_cached_url(self, mocker):
+        mock_unshortener = mocker.Mock()
+        mocker.patch("unshortenit.UnshortenIt", return_value=mock_unshortener)
+        mock_unshortener.unshorten.return_value = "https://example.com/resolved"
+        cache = StateStore("test_unshorten_cache")
+        cache.update(
+            "https://bit.ly/cached",
+            url="https://example.com/cached",
+            resolved_at=time.time(),
+        )
+        cache.update(
+            "https://bit.ly/expired",
+            url="https://example.com/expired",
+            resolved_at=time.time() - config.unshorten_cache_ttl,
+        )
+
+        cached, _ = unshorten_url(
+            {"link": "https://bit.ly/cached", "title": "Cached"}, cache=cache
+        )
+        expired, _ = unshorten_url(
+            {"link": "https://bit.ly/expired", "title": "Expired"}, cache=cache
+        )
+
+        assert cached["url"] == "https://example.com/cached"
+        assert expired["url"] == "https://example.com/resolved"
+        assert mock_unshortener.unshorten.call_count == 1
+        assert (
+            cache.get("https://bit.ly/expired")["url"] == "https://example.com/resolved"
+        )
+
+
+class TestNeedsUnshortening:
+    # Links on a shortener are resolved, even if it is a destination domain.
+    def test_shortener(self):
+        assert needs_unshortening("https://bit.ly/3i2QJgA", ["bit.ly"])
+
+    # Links on a destination domain, or one of its subdomains, are kept.
+    @pytest.mark.parametrize(
+        "link",
+        [
+            "https://example.com/article",
+            "https://www.example.com/article",
+            "https://NEWS.Example.com/article",
+        ],
+    )
+    def test_destination_domain(self, link):
+        assert not needs_unshortening(link, ["www.example.com"])
+
+    # Links off the destination domains are resolved.
+    @pytest.mark.parametrize(
+        "link", ["https://notexample.com/article", "https://other.com/article"]
+    )
+    def test_other_domain(self, link):
+        assert needs_unshortening(link, ["example.com"])
+
 
 class TestScrubHtml:
     # Scrubs HTML content in a dictionary with valid HTML tags and attributes.
@@ -181,3 +288,70 @@ class TestScrubHtml:
         assert scrubbed_feed["title"] == "This is a title"
         assert scrubbed_feed["description"] == "This is a description"
         assert scrubbed_feed["content"] == "alert('Hello World!')"
+
+
+class TestProcessFeedBatch:
+    # The entries of every feed in the batch are processed, and returned by feed.
+    def test_processes_every_feed(self, mocker):
+        mocker.patch(
+            "aggregator.processor.process_articles",
+            side_effect=lambda entry, publisher, feed_info: entry["title"] or None,
+        )
+
+        result = process_feed_batch(
+            [
+                ("feed1", {}, {}, [{"title": "a"}, {"title": ""}]),
+                ("feed2", {}, {}, [{"title": "b"}]),
+            ]
+        )
+
+        assert result == [("feed1", ["a", None]), ("feed2", ["b"])]
+
+    # The values are the same as the ones bleach returns, whether they are skipped or not.
+    def test_same_as_bleach(self):
+        values = [
+            "Plain title",
+            "A > B",
+            "Tom & Jerry",
+            "Tom &amp; Jerry &lt;3",
+            "line\r\nbreak",
+            "tab\tand\nnewline",
+            "control\x0bcharacter",
+            "null\x00character",
+            "<p>Paragraph</p>",
+            "é ☃ 😀",
+        ]
+        feed = {f"key{index}": value for index, value in enumerate(values)}
+
+        scrubbed_feed = scrub_html(dict(feed))
+
+        for key, value in feed.items():
+            expected = bleach.clean(value, strip=True).replace("&amp;", "&")
+            assert scrubbed_feed[key] == expected, value
+
+    # The fields set by the aggregator, the values that are not strings and the strings
+    # without markup are not sent to bleach.
+    def test_skips_safe_values(self, mocker):
+        mock_clean = mocker.patch("bleach.clean")
+
+        feed = {
+            "url_hash": "<not scrubbed>",
+            "publish_time": "2024-05-06 10:00:00",
+            "channels": ["Top News"],
+            "pop_score": 1.5,
+            "img": None,
+            "title": "No markup in this title",
+        }
+
+        assert scrub_html(dict(feed)) == feed
+        mock_clean.assert_not_called()
+
+    # Repeated values are scrubbed once.
+    def test_memoised(self, mocker):
+        spy_clean = mocker.spy(bleach, "clean")
+
+        scrub_html({"publisher_name": "Memoised &amp; Co"})
+        scrubbed_feed = scrub_html({"publisher_name": "Memoised &amp; Co"})
+
+        assert scrubbed_feed["publisher_name"] == "Memoised & Co"
+        assert spy_clean.call_count == 1
@@ -0,0 +1,101 @@
+import random
+
+import feedparser
+import pytest
+from better_profanity import Profanity
+
+from aggregator.profanity_filter import (
+    CHARS_MAPPING,
+    ProfanityFilter,
+    custom_badwords,
+    profanity_filter,
+)
+from config import get_config
+
+config = get_config()
+
+SEPARATORS = [" ", "  ", "-", ".", "_", ", ", "!", " - ", "'", "…", "é"]
+
+
+@pytest.fixture(scope="module")
+def better_profanity():
+    profanity = Profanity()
+    profanity.add_censor_words(custom_badwords)
+    return profanity
+
+
+def get_titles(swear_words):
+    """
+    Returns the titles of the test feed, and titles mixing them with variants of swear words:
+    leetspeak, upper case, spelled out, and cut at random.
+    """
+    titles = [
+        entry["title"]
+        for entry in feedparser.parse(
+            (config.tests_data_dir / "test.rss").read_bytes()
+        )["entries"]
+    ]
+    words = " ".join(titles).split()
+    rnd = random.Random(0)
+
+    def get_variant(word):
+        word = "".join(
+            (
+                rnd.choice(CHARS_MAPPING[char])
+                if char in CHARS_MAPPING and rnd.random() < 0.3
+                else char
+            )
+            for char in word
+        )
+        if rnd.random() < 0.2:
+            word = rnd.choice(SEPARATORS).join(word)
+        return word.upper() if rnd.random() < 0.2 else word
+
+    mixed_titles = []
+    for _ in range(300):
+        title = ""
+        for _ in range(rnd.randint(1, 6)):
+            word = rnd.choice(words)
+            if rnd.random() < 0.3:
+                word = get_variant(rnd.choice(swear_words))
+            title += word + rnd.choice(SEPARATORS)
+        if rnd.random() < 0.5:
+            title = title[: rnd.randint(0, len(title))]
+        mixed_titles.append(title)
+
+    return titles + [title.lower() for title in titles + mixed_titles] + mixed_titles
+
+
+class TestProfanityFilter:
+    # The verdicts are the same as the ones of better_profanity.
+    def test_same_verdicts_as_better_profanity(self, better_profanity):
+        swear_words = [str(word) for word in better_profanity.CENSOR_WORDSET]
+
+        for title in get_titles(swear_words) + swear_words:
+            assert profanity_filter.contains_profanity(
+                title
+            ) == better_profanity.contains_profanity(title), title
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            ("what the shit", True),
+            ("what the sh1t", True),
+            ("what the $h1t", True),
+            ("what the sh*t", True),
+            ("a hand job offer", True),
+            ("hedonistic retreat", True),
+            ("a class assessment in scunthorpe", False),
+            ("handy jobs", False),
+        ],
+    )
+    def test_contains_profanity(self, text, expected):
+        assert profanity_filter.contains_profanity(text) is expected
+
+    # Swear words made of several words are found across the separators of the text.
+    def test_joined_words(self):
+        profanity = ProfanityFilter(["two words"], CHARS_MAPPING)
+
+        assert profanity.contains_profanity("say two words now")
+        assert profanity.contains_profanity("say tw0 w0rds now")
+        assert not profanity.contains_profanity("say two other words")
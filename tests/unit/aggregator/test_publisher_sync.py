@@ -0,0 +1,59 @@
+from publisher_sync import get_diff, get_wanted_state
+
+
+def get_source(publisher_id, site_url, locales, **fields):
+    return {
+        "publisher_name": "Example",
+        "site_url": site_url,
+        "feed_url": f"{site_url}/{publisher_id}",
+        "favicon_url": None,
+        "cover_url": None,
+        "background_color": None,
+        "enabled": True,
+        "score": 0.0,
+        "category": "Top News",
+        "publisher_id": publisher_id,
+        "locales": locales,
+        **fields,
+    }
+
+
+class TestGetWantedState:
+    # The publishers are keyed by site URL, set by their first feed, and the feed locales
+    # by feed and locale.
+    def test_wanted_state(self):
+        publishers, feeds, feed_locales = get_wanted_state(
+            [
+                get_source(
+                    "hash1",
+                    "https://example.com",
+                    [{"locale": "en_US", "rank": None, "channels": ["Tech", "Tech"]}],
+                ),
+                get_source("hash2", "https://example.com", [], publisher_name="Other"),
+            ]
+        )
+
+        assert list(publishers) == ["https://example.com"]
+        assert publishers["https://example.com"]["name"] == "Example"
+        assert list(feeds) == ["hash1", "hash2"]
+        assert feed_locales == {("hash1", "en_US"): {"rank": 0, "channels": {"Tech"}}}
+
+
+class TestGetDiff:
+    # Only the missing rows are inserted, and only the changed rows updated.
+    def test_diff(self):
+        current = {
+            "same": {"id": 1, "rank": 1},
+            "changed": {"id": 2, "rank": 1},
+            "removed": {"id": 3, "rank": 1},
+        }
+        wanted = {
+            "same": {"rank": 1},
+            "changed": {"rank": 2},
+            "new": {"rank": 1},
+        }
+
+        assert get_diff(current, wanted, ("rank",)) == (
+            [{"rank": 1}],
+            [{"id": 2, "rank": 2}],
+        )
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+from aggregator.scheduler import FeedScheduler
+from aggregator.state_store import StateStore
+
+NOW = datetime(2024, 5, 1, 12, 0, 0)
+
+
+def get_scheduler(last_polled, last_build_time, last_build_timedelta=0.0):
+    feed_state = StateStore("test_feed_state")
+    feed_state.update(
+        "https://example.com/feed",
+        entries=[{"title": "Example Article"}],
+        last_polled=last_polled.isoformat(),
+    )
+    update_records = {
+        "url_hash": {
+            "last_build_time": last_build_time,
+            "last_build_timedelta": last_build_timedelta,
+        }
+    }
+    return FeedScheduler(feed_state, update_records, now=NOW)
+
+
+class TestFeedScheduler:
+    # A feed that published recently is polled every run.
+    def test_active_feed_is_due(self):
+        scheduler = get_scheduler(
+            last_polled=NOW - timedelta(minutes=5),
+            last_build_time=NOW - timedelta(hours=2),
+        )
+
+        assert scheduler.is_due("https://example.com/feed", "url_hash")
+
+    # A feed idle for days is not polled again right away.
+    def test_idle_feed_is_not_due(self):
+        scheduler = get_scheduler(
+            last_polled=NOW - timedelta(hours=1),
+            last_build_time=NOW - timedelta(days=4),
+        )
+
+        assert not scheduler.is_due("https://example.com/feed", "url_hash")
+
+    # An idle feed is polled again once its poll interval is over.
+    def test_idle_feed_is_due_after_max_interval(self):
+        scheduler = get_scheduler(
+            last_polled=NOW - timedelta(hours=13),
+            last_build_time=NOW - timedelta(days=30),
+        )
+
+        assert scheduler.is_due("https://example.com/feed", "url_hash")
+
+    # The poll interval never exceeds half the usual time between two builds.
+    def test_interval_bounded_by_build_cadence(self):
+        scheduler = get_scheduler(
+            last_polled=NOW - timedelta(hours=1),
+            last_build_time=NOW - timedelta(days=4),
+            last_build_timedelta=timedelta(hours=1).total_seconds(),
+        )
+
+        assert scheduler.is_due("https://example.com/feed", "url_hash")
+
+    # Feeds without history are always due.
+    def test_feed_without_history_is_due(self):
+        scheduler = FeedScheduler(StateStore("test_feed_state"), {}, now=NOW)
+
+        assert scheduler.is_due("https://example.com/feed", "url_hash")
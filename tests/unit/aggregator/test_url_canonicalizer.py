@@ -0,0 +1,56 @@
+import pytest
+
+from aggregator.url_canonicalizer import RULES, canonicalize_url
+from config import get_config
+
+config = get_config()
+
+
+class TestCanonicalizeUrl:
+    # The links that differ only by tracking parameters, fragment, trailing slash or host
+    # case get the same URL with the default rules.
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "https://www.example.com/news/article",
+            "https://WWW.Example.com/news/article",
+            "HTTPS://www.example.com:443/news/article",
+            "https://www.example.com/news/article/",
+            "https://www.example.com/news/article#comments",
+            "https://www.example.com/news/article?utm_source=rss&utm_medium=feed",
+            "https://www.example.com/news/article?fbclid=abc&UTM_campaign=x",
+        ],
+    )
+    def test_default_rules(self, url):
+        assert (
+            canonicalize_url(url, config.url_canonicalization_rules)
+            == "https://www.example.com/news/article"
+        )
+
+    # The path case, other query parameters and non default ports are kept.
+    def test_keeps_identifying_parts(self):
+        url = "http://Example.com:8080/News/Article?id=42&utm_source=rss&page=2"
+
+        assert (
+            canonicalize_url(url, config.url_canonicalization_rules)
+            == "http://example.com:8080/News/Article?id=42&page=2"
+        )
+
+    # Only the given rules are applied.
+    def test_publisher_rules(self):
+        url = "https://Example.com/article/?id=42#top"
+
+        assert canonicalize_url(url, []) == url
+        assert canonicalize_url(url, ["drop_fragment"]) == (
+            "https://Example.com/article/?id=42"
+        )
+        assert canonicalize_url(url, ["drop_query"]) == (
+            "https://Example.com/article/#top"
+        )
+        assert canonicalize_url(url, RULES) == "https://example.com/article"
+
+    # URLs that can't be parsed are kept as they are.
+    def test_invalid_url(self):
+        url = "https://example.com:port/article/"
+
+        assert canonicalize_url(url, RULES) == url
@@ -9,7 +9,8 @@ import os
 import feedparser
 
 from aggregator.aggregate import Aggregator
-from aggregator.parser import download_feed, score_entries
+from aggregator.async_fetcher import fetch_feeds
+from aggregator.parser import score_entries
 from aggregator.processor import scrub_html
 from config import get_config
 
@@ -17,7 +18,7 @@ config = get_config()
 
 
 def test_feed_processor_download():
-    result = download_feed("https://brave.com/blog/index.xml")
+    result = fetch_feeds({"https://brave.com/blog/index.xml": {}})
     assert result
 
 
@@ -51,7 +52,7 @@ def test_download_feeds():
     }
     fp = Aggregator(data, config.output_feed_path / "test.json")
     fp.report["feed_stats"] = {}
-    result = fp.download_feeds()
+    result = list(fp.download_feeds())
     assert len(result) != 0
 
 